@@ -0,0 +1,197 @@
+"""
+Headless batch runner: plays many games across a process pool and streams
+per-game results to a CSV as they finish.
+
+    python src/main.py bench --agent greedy --games 1000 --workers 16 --seed 0 \\
+        --output src/data/greedy/test.csv
+
+With --monitor [HOST:]PORT the games also publish board snapshots there for
+`main.py monitor --attach` (see monitor.py).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import instrumentation
+
+HEADER = "game, seed, dropped, rows, seconds\n"
+
+# One trajectory writer per worker process, so its shards fill up across games
+_recorder = None
+
+
+def play_game(job):
+    """Play one headless game; runs inside a worker process."""
+    from game import Game
+    from genetic import Genetic_AI
+    from genetic_pruned import Pruned_Genetic_AI
+
+    global _recorder
+    index, seed, agent, genotype, width, height, profile, record, monitor = job
+    if record and _recorder is None:
+        from trajectories import TrajectoryWriter
+
+        _recorder = TrajectoryWriter(record, width=width, height=height)
+    # Agents draw from the global generators (random genotypes, MCTS rollouts)
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    ai = None
+    if agent == "genetic" and genotype is not None:
+        ai = Genetic_AI(genotype=np.array(genotype))
+    elif agent == "genetic_pruned" and genotype is not None:
+        ai = Pruned_Genetic_AI(genotype=np.array(genotype))
+    if profile:
+        instrumentation.enable()
+    recorder = _recorder
+    if monitor is not None:
+        from monitor import SnapshotPublisher
+
+        recorder = SnapshotPublisher(monitor, index, recorder=_recorder)
+    start = time.perf_counter()
+    game = Game(agent, agent=ai, seed=seed, width=width, height=height, recorder=recorder)
+    dropped, rows = game.run_no_visual(verbose=False)
+    if monitor is not None:
+        recorder.publish(game.board, done=True)
+    if _recorder is not None:
+        _recorder.flush()
+    seconds = time.perf_counter() - start
+    stats = instrumentation.disable()
+    return index, seed, dropped, rows, seconds, stats.to_dict() if stats else None
+
+
+def read_completed(path):
+    """Return the game indices already recorded in a results file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        header = f.readline()
+        if header.split(",")[0].strip() != "game":
+            raise ValueError(f"{path} is not a bench results file, refusing to resume")
+        for line in f:
+            fields = line.split(",")
+            # A torn last line from a killed run is simply replayed
+            if len(fields) == 5 and line.endswith("\n"):
+                done.add(int(fields[0]))
+    return done
+
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def run_batch(agent, games, workers, seed, output, genotype=None, resume=False, width=10, height=20, profile=None, record=None, telemetry=None, monitor=None):
+    """
+    Play `games` games with `workers` processes, appending one line per game to
+    `output`. Game i uses piece seed `seed + i`, so a batch is reproducible and
+    can be resumed by skipping the indices already present in the file.
+    With `profile`, per-decision instrumentation of all games is written there as JSON.
+    With `record`, every move is appended to trajectory shards in that directory.
+    With `telemetry` (a telemetry.Telemetry), progress is also published there.
+    With `monitor` ('host:port'), games publish snapshots for monitor.py to that address.
+    """
+    from monitor import with_run_id
+
+    monitor = with_run_id(monitor)
+    done = read_completed(output) if resume else set()
+    jobs = [
+        (i, seed + i, agent, genotype, width, height, profile is not None, record, monitor)
+        for i in range(games)
+        if i not in done
+    ]
+    stats = instrumentation.Stats()
+
+    mode = "a" if resume and os.path.exists(output) else "w"
+    if mode == "a":
+        # Drop a torn trailing line so appended rows start on a fresh line
+        with open(output, "rb+") as f:
+            data = f.read()
+            f.seek(data.rfind(b"\n") + 1)
+            f.truncate()
+    with open(output, mode) as out:
+        if mode == "w":
+            out.write(HEADER)
+        print(f"{len(done)} games already done, {len(jobs)} to play", file=sys.stderr)
+
+        start = time.perf_counter()
+        pieces = 0
+        with Pool(workers) as pool:
+            for n, (index, game_seed, dropped, rows, seconds, game_stats) in enumerate(
+                pool.imap_unordered(play_game, jobs), 1
+            ):
+                out.write(f"{index}, {game_seed}, {dropped}, {rows}, {seconds:.3f}\n")
+                out.flush()
+                if game_stats:
+                    stats.merge(game_stats)
+                pieces += dropped
+                if telemetry is not None:
+                    telemetry.game(dropped)
+                elapsed = time.perf_counter() - start
+                rate = n / elapsed
+                eta = (len(jobs) - n) / rate
+                sys.stderr.write(
+                    f"\r{len(done) + n}/{games} games | {rate:.2f} games/s | "
+                    f"{pieces / elapsed:.0f} pieces/s | ETA {format_eta(eta)}"
+                )
+        sys.stderr.write("\n")
+    if telemetry is not None:
+        telemetry.close()
+    if profile is not None:
+        stats.to_json(profile)
+        print(stats.summary(), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py bench", description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--agent", choices=["greedy", "genetic", "genetic_pruned", "mcts", "mcts_array", "table"], default="greedy")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="defaults to data/<agent>/bench.csv")
+    parser.add_argument("--genotype", default=None, help="comma separated weights for the genetic agents")
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=20)
+    parser.add_argument("--profile", default=None, help="record per-decision timings and write them to this JSON file")
+    parser.add_argument("--record", default=None, help="directory to append per-move trajectories to")
+    parser.add_argument("--resume", action="store_true", help="skip games already in the output file")
+    parser.add_argument("--telemetry", default=None, help="publish progress to data/telemetry/<name>.jsonl")
+    parser.add_argument("--telemetry-port", type=int, default=None, help="also serve the progress on this local port")
+    parser.add_argument("--monitor", default=None, metavar="[HOST:]PORT", help="publish board snapshots for main.py monitor --attach")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "data", args.agent, "bench.csv")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    genotype = None
+    if args.genotype is not None:
+        genotype = [float(w) for w in args.genotype.split(",")]
+    telemetry = None
+    if args.telemetry or args.telemetry_port is not None:
+        from telemetry import Telemetry
+
+        telemetry = Telemetry(args.telemetry or f"bench_{args.agent}", port=args.telemetry_port)
+    run_batch(
+        args.agent,
+        args.games,
+        args.workers,
+        args.seed,
+        output,
+        genotype=genotype,
+        resume=args.resume,
+        width=args.width,
+        height=args.height,
+        profile=args.profile,
+        record=args.record,
+        telemetry=telemetry,
+        monitor=args.monitor,
+    )
+
+
+if __name__ == "__main__":
+    main()
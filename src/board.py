@@ -7,8 +7,8 @@ from copy import deepcopy
 class Board:
 
     """Initialize the board with specified dimensions and properties."""
-    def __init__(self):
-        self.width, self.height = 10, 20  # Set board dimensions
+    def __init__(self, width=10, height=20):
+        self.width, self.height = width, height  # Set board dimensions
         self.board = self.init_board()  # Initialize the board with empty cells
         self.colors = self.init_board()  # Initialize the color board
         self.widths = [0] * (self.height + 4)  # Track the width of each row (including extra space)
@@ -25,13 +25,43 @@ class Board:
             b.append(row)
         return b
 
-    """Revert the board to its previous state."""
-    def undo(self):
-        
-        self.board = self.last_board
-        self.colors = self.last_colors
-        self.widths = self.last_widths
-        self.heights = self.last_heights
+    """Place a piece, clear full rows and return a journal of what changed, for undo()."""
+    def apply(self, x, y, piece, clear=True):
+
+        cells = [(y + pos[1], x + pos[0]) for pos in piece.body]
+        for row, col in cells:
+            if row < 0 or row >= self.height + 4 or col < 0 or col >= self.width or self.board[row][col]:
+                raise Exception("Bad placement")
+        old_heights = [(col, self.heights[col]) for col in range(x, x + len(piece.skirt))]
+        for row, col in cells:
+            self.board[row][col] = True
+            self.colors[row][col] = piece.color
+            self.widths[row] += 1
+            self.heights[col] = max(self.heights[col], row + 1)
+
+        # clear_rows() replaces the heights list, so keeping the old object is enough to restore it
+        heights = self.heights
+        cleared = self.clear_rows_journaled() if clear else []
+        return cells, old_heights, heights, cleared
+
+    """Revert a move recorded by apply(), leaving the board exactly as it was before."""
+    def undo(self, move):
+
+        cells, old_heights, heights, cleared = move
+        for row, board_row, color_row, width in reversed(cleared):
+            self.board.pop()
+            self.colors.pop()
+            self.widths.pop()
+            self.board.insert(row, board_row)
+            self.colors.insert(row, color_row)
+            self.widths.insert(row, width)
+        self.heights = heights
+        for row, col in cells:
+            self.board[row][col] = False
+            self.colors[row][col] = False
+            self.widths[row] -= 1
+        for col, height in old_heights:
+            self.heights[col] = height
 
     """Place a piece on the board at the specified position."""
     def place(self, x, y, piece):
@@ -83,23 +113,46 @@ class Board:
 
         # Remove full rows and update board
         for row in to_delete:
-            del self.board[row]
-            self.board.append([False] * self.width)
-
-            del self.widths[row]
-            self.widths.append(0)
-
-            del self.colors[row]
-            self.colors.append([False] * self.width)
+            self.delete_row(row)
 
         # Update heights after clearing rows
         if num > 0:
-            heights = []
-            for col in range(self.width):
-                m = 0
-                for row in range(self.height):
-                    if self.board[row][col]:
-                        m = row + 1
-                heights.append(m)
-            self.heights = heights
+            self.update_heights()
         return num
+
+    """Clear completed rows like clear_rows(), returning the removed rows for undo()."""
+    def clear_rows_journaled(self):
+
+        cleared = []
+        to_delete = [i for i in range(len(self.widths)) if self.widths[i] >= self.width]
+        for row in to_delete:
+            cleared.append(self.delete_row(row))
+        if cleared:
+            self.update_heights()
+        return cleared
+
+    """Remove one row, shifting the rows above it down, and return what was removed."""
+    def delete_row(self, row):
+
+        removed = (row, self.board[row], self.colors[row], self.widths[row])
+        del self.board[row]
+        self.board.append([False] * self.width)
+
+        del self.widths[row]
+        self.widths.append(0)
+
+        del self.colors[row]
+        self.colors.append([False] * self.width)
+        return removed
+
+    """Recompute every column height from the visible rows."""
+    def update_heights(self):
+
+        heights = []
+        for col in range(self.width):
+            m = 0
+            for row in range(self.height):
+                if self.board[row][col]:
+                    m = row + 1
+            heights.append(m)
+        self.heights = heights
@@ -0,0 +1,78 @@
+"""
+Benchmarks how agent decision latency and memory scale with the board size.
+
+    python src/board_scaling.py --sizes 10x20 14x28 20x40 --decisions 50
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from board import Board
+from genetic import Genetic_AI
+from greedy import Greedy_AI
+from mcts import MCTS_AI
+from piece import BODIES, Piece
+
+AGENTS = {
+    "greedy": Greedy_AI,
+    "genetic": lambda: Genetic_AI(genotype=np.array([-0.5, -0.8, -0.2, 0.1, -0.3, -0.4, -0.2, -0.3, 0.2])),
+    "mcts": MCTS_AI,
+}
+
+
+def make_board(width, height, fill, rng):
+    """Drop random pieces at random columns until the stack reaches `fill` of the height."""
+    board = Board(width, height)
+    while max(board.heights) < fill * height:
+        piece = Piece(*rng.choice(BODIES))
+        for _ in range(rng.randrange(4)):
+            piece = piece.get_next_rotation()
+        x = rng.randrange(width - len(piece.skirt) + 1)
+        board.place(x, board.drop_height(piece, x), piece)
+        board.clear_rows()
+    return board
+
+
+def measure(agent, width, height, decisions, fill=0.4, seed=0):
+    """Return (mean seconds per decision, peak bytes allocated by one decision)."""
+    rng = random.Random(seed)
+    boards = [make_board(width, height, fill, rng) for _ in range(decisions)]
+    pieces = [Piece(*rng.choice(BODIES)) for _ in range(decisions)]
+
+    start = time.perf_counter()
+    for board, piece in zip(boards, pieces):
+        agent.get_best_move(board, piece)
+    latency = (time.perf_counter() - start) / decisions
+
+    peak = 0
+    for board, piece in zip(boards[:5], pieces[:5]):
+        tracemalloc.start()
+        agent.get_best_move(board, piece)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return latency, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decision latency and memory versus board size")
+    parser.add_argument("--sizes", nargs="+", default=["10x20", "14x28", "20x40"], help="WIDTHxHEIGHT")
+    parser.add_argument("--agents", nargs="+", default=list(AGENTS), choices=list(AGENTS))
+    parser.add_argument("--decisions", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'agent':<8} {'size':>6} {'ms/decision':>12} {'peak KiB':>9}")
+    for name in args.agents:
+        agent = AGENTS[name]()
+        for size in args.sizes:
+            width, height = (int(v) for v in size.split("x"))
+            latency, peak = measure(agent, width, height, args.decisions, seed=args.seed)
+            print(f"{name:<8} {size:>6} {latency * 1000:>12.2f} {peak / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
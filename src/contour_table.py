@@ -0,0 +1,147 @@
+import os
+import numpy as np
+from greedy import Greedy_AI
+from piece import BODIES2, PIECE_IDS, PIECE_ROTATIONS
+import instrumentation
+
+"""
+Precomputed greedy policy indexed by the board's top contour.
+
+On a board without holes, Greedy_AI's choice only depends on the differences
+between neighbouring column heights and on the piece. The builder enumerates
+every contour with differences in [-clip, clip], finds Greedy_AI.cost's best
+(rotation, x) for each piece and stores it as a (num_pieces, num_contours)
+uint8 table on disk. Table_AI memory-maps the table and answers with a single
+lookup, falling back to the full greedy search when the board has holes or a
+height difference is outside the table. Tables are built for one board size.
+
+    python src/contour_table.py --width 10 --height 20 --clip 2
+"""
+
+TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tables")
+NO_MOVE = 255
+
+
+def table_path(width, height, clip):
+    return os.path.join(TABLE_DIR, f"contour_w{width}_h{height}_c{clip}.npy")
+
+
+def contour_index(heights, clip):
+    """Index of a contour in the table, or -1 if a difference is out of range."""
+    index = 0
+    for i in range(len(heights) - 1):
+        d = heights[i + 1] - heights[i]
+        if d < -clip or d > clip:
+            return -1
+        index = index * (2 * clip + 1) + d + clip
+    return index
+
+
+def contour_heights(width, clip):
+    """Column heights of every contour, shifted so the lowest column is 0, in index order."""
+    base = 2 * clip + 1
+    digits = np.indices((base,) * (width - 1)).reshape(width - 1, -1).T - clip
+    heights = np.zeros((len(digits), width), dtype=np.int16)
+    heights[:, 1:] = np.cumsum(digits, axis=1)
+    heights -= heights.min(axis=1, keepdims=True)
+    return heights
+
+
+def placement_costs(heights, piece, x, num_rows):
+    """
+    Greedy_AI.cost of dropping `piece` at column x on each hole-free board
+    described by `heights` (rows of column heights).
+    """
+    cols = range(len(piece.skirt))
+    tops = [max(p[1] for p in piece.body if p[0] == i) + 1 for i in cols]
+    under = heights[:, x : x + len(piece.skirt)]
+    y = np.max(under - np.array(piece.skirt), axis=1)
+
+    new_heights = heights.copy()
+    holes = np.zeros(len(heights), dtype=np.int32)
+    for i in cols:
+        bottom = y + piece.skirt[i]
+        holes += bottom - under[:, i]
+        new_heights[:, x + i] = y + tops[i]
+
+    # Only rows the piece touches can become full; everything below the lowest column is empty
+    outside = np.delete(heights, range(x, x + len(piece.skirt)), axis=1)
+    outside_min = outside.min(axis=1) if outside.shape[1] else np.full(len(heights), num_rows)
+    cleared = np.zeros(len(heights), dtype=np.int32)
+    for dy in range(4):
+        r = y + dy
+        full = outside_min > r
+        for i in cols:
+            covered = (under[:, i] > r) | ((y + piece.skirt[i] <= r) & (r < y + tops[i]))
+            full &= covered
+        cleared += full
+
+    top_rows = np.maximum(new_heights - 1, 0)
+    bumpiness = np.abs(np.diff(top_rows, axis=1)).sum(axis=1)
+    cost = 0.5 * top_rows.sum(axis=1) + 0.35 * holes + 0.18 * bumpiness - 0.76 * cleared
+    cost[new_heights.max(axis=1) > num_rows] = np.inf
+    return cost
+
+
+def build_table(width=10, height=20, clip=2, path=None, chunk=200000):
+    """Compute the policy table and save it as .npy. Returns the path."""
+    path = path or table_path(width, height, clip)
+    num_contours = (2 * clip + 1) ** (width - 1)
+    table = np.full((len(BODIES2), num_contours), NO_MOVE, dtype=np.uint8)
+    all_heights = contour_heights(width, clip)
+    for start in range(0, num_contours, chunk):
+        heights = all_heights[start : start + chunk]
+        for piece_id, (body, color) in enumerate(BODIES2):
+            costs, moves = [], []
+            for rotation, piece in enumerate(PIECE_ROTATIONS[piece_id]):
+                for x in range(width - len(piece.skirt) + 1):
+                    costs.append(placement_costs(heights, piece, x, height + 4))
+                    moves.append(rotation * 16 + x)
+            costs = np.stack(costs, axis=1)
+            # First minimum, like the strict '<' in Greedy_AI.get_best_move
+            best = np.argmin(costs, axis=1)
+            chosen = np.array(moves, dtype=np.uint8)[best]
+            chosen[np.isinf(costs.min(axis=1))] = NO_MOVE
+            table[piece_id, start : start + chunk] = chosen
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, table)
+    return path
+
+
+class Table_AI:
+    def __init__(self, width=10, height=20, clip=2, path=None):
+        self.clip = clip
+        path = path or table_path(width, height, clip)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"no contour table for a {width}x{height} board with clip {clip} at {path}, build it with: "
+                f"python src/contour_table.py --width {width} --height {height} --clip {clip}"
+            )
+        self.table = np.load(path, mmap_mode="r")
+        self.fallback = Greedy_AI()
+
+    def get_best_move(self, board, piece):
+        piece_id = PIECE_IDS.get(tuple(piece.body))
+        # Without holes every filled cell is below its column's height
+        if piece_id is not None and sum(board.widths) == sum(board.heights) and min(board.heights) == 0:
+            index = contour_index(board.heights, self.clip)
+            if index >= 0:
+                move = int(self.table[piece_id, index])
+                if move != NO_MOVE:
+                    if instrumentation.active:
+                        instrumentation.active.count("table_hits")
+                    return move % 16, PIECE_ROTATIONS[piece_id][move // 16]
+        if instrumentation.active:
+            instrumentation.active.count("table_misses")
+        return self.fallback.get_best_move(board, piece)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the contour policy table")
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=20)
+    parser.add_argument("--clip", type=int, default=2, help="largest absolute height difference in the table")
+    args = parser.parse_args()
+    print(build_table(args.width, args.height, args.clip))
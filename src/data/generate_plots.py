@@ -1,16 +1,240 @@
+"""
+Results pipeline: ingests every results CSV under data/ into one cached table
+per kind, summarizes them and renders the comparison plots headlessly.
+
+    python src/data/generate_plots.py            # plots and summary in data/plots/
+
+Two kinds of CSV are recognized from their header:
+  - games:  one row per game with 'dropped' and 'rows' columns (greedy,
+            expectiminimax, bench and tournament outputs, with or without
+            spaces); an 'agent' column, if any, names the agent of each row
+  - epochs: run_X_epochs logs with avg_fit/top_fit/elite_fit and the
+            stringified genotype arrays, or the older 'total fittness,
+            top fitness, top relative, top genotype' logs (top only)
+The cache (data/.results_cache.pkl) keeps each file's parsed rows keyed by
+path with its mtime, size and hash, so only new or modified files are parsed.
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+
 import numpy as np
 import pandas as pd
 
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(DATA_DIR, ".results_cache.pkl")
+PLOTS_DIR = os.path.join(DATA_DIR, "plots")
+
+GENE_COLUMNS = ["avg_gene", "top_gene", "elite_gene"]
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def parse_gene(text):
+    return np.array(text.strip().strip("[]").split(), dtype=float)
+
+
+def parse_csv(path):
+    """Return (kind, frame) for a results CSV, or (None, None) if it is not one."""
+    df = pd.read_csv(path, skipinitialspace=True)
+    df.columns = [c.strip() for c in df.columns]
+    source = os.path.splitext(os.path.relpath(path, DATA_DIR))[0]
+    if {"dropped", "rows"} <= set(df.columns):
+        games = pd.DataFrame(
+            {
+                "source": source,
+                "agent": df["agent"].astype(str) if "agent" in df else source,
+                "dropped": df["dropped"].astype(int),
+                "rows": df["rows"].astype(int),
+            }
+        )
+        return "games", games
+    if {"avg_fit", "avg_gene", "top_fit", "elite_fit"} <= set(df.columns):
+        # The first row is the placeholder written before epoch 0
+        df = df.iloc[1:].reset_index(drop=True)
+        epochs = pd.DataFrame(
+            {
+                "source": source,
+                "epoch": np.arange(len(df)),
+                "avg_fit": df["avg_fit"].astype(float),
+                "top_fit": df["top_fit"].astype(float),
+                "elite_fit": df["elite_fit"].astype(float),
+            }
+        )
+        for column in GENE_COLUMNS:
+            if column in df:
+                genes = np.stack([parse_gene(g) for g in df[column]]) if len(df) else np.empty((0, 9))
+                for i in range(genes.shape[1]):
+                    epochs[f"{column}_{i}"] = genes[:, i]
+        return "epochs", epochs
+    if {"total fittness", "top fitness", "top genotype"} <= set(df.columns):
+        # Older logs: population total instead of the average, and no placeholder row
+        epochs = pd.DataFrame(
+            {
+                "source": source,
+                "epoch": np.arange(len(df)),
+                "avg_fit": np.nan,
+                "top_fit": df["top fitness"].astype(float),
+                "elite_fit": np.nan,
+            }
+        )
+        genes = np.stack([parse_gene(g) for g in df["top genotype"]])
+        for i in range(genes.shape[1]):
+            epochs[f"top_gene_{i}"] = genes[:, i]
+        return "epochs", epochs
+    return None, None
+
+
+def find_csvs(roots):
+    paths = []
+    for root in roots:
+        if os.path.isfile(root):
+            paths.append(os.path.abspath(root))
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d != "plots"]
+            paths += [os.path.join(dirpath, f) for f in filenames if f.endswith(".csv")]
+    return sorted(paths)
+
+
+def load_results(roots=(DATA_DIR,), cache_path=CACHE_PATH):
+    """
+    Return {'games': DataFrame, 'epochs': DataFrame} for every results CSV under
+    `roots`, re-parsing only files whose size/mtime and content hash changed.
+    """
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            cache = pickle.load(f)
+
+    entries = {}
+    parsed = 0
+    for path in find_csvs(roots):
+        stat = os.stat(path)
+        entry = cache.get(path)
+        if entry is not None and (entry["mtime"], entry["size"]) == (stat.st_mtime, stat.st_size):
+            entries[path] = entry
+            continue
+        digest = file_hash(path)
+        if entry is None or entry["hash"] != digest:
+            try:
+                kind, frame = parse_csv(path)
+            except (ValueError, KeyError, pd.errors.ParserError) as e:
+                print(f"skipping {path}: {e}", file=sys.stderr)
+                kind, frame = None, None
+            entry = {"kind": kind, "frame": frame}
+            parsed += 1
+        entries[path] = dict(entry, mtime=stat.st_mtime, size=stat.st_size, hash=digest)
+
+    if parsed or set(entries) != set(cache):
+        with open(cache_path, "wb") as f:
+            pickle.dump(entries, f)
+
+    results = {}
+    for kind in ["games", "epochs"]:
+        frames = [e["frame"] for e in entries.values() if e["kind"] == kind]
+        results[kind] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return results
+
+
+def summarize_games(games, z=1.96):
+    """Mean, standard deviation and normal confidence interval of pieces/rows per agent."""
+    grouped = games.groupby("agent")
+    summary = grouped[["dropped", "rows"]].agg(["count", "mean", "std"])
+    summary.columns = ["_".join(c) for c in summary.columns]
+    for column in ["dropped", "rows"]:
+        half = z * summary[f"{column}_std"].fillna(0) / np.sqrt(summary[f"{column}_count"])
+        summary[f"{column}_ci_low"] = summary[f"{column}_mean"] - half
+        summary[f"{column}_ci_high"] = summary[f"{column}_mean"] + half
+    return summary.sort_values("dropped_mean", ascending=False)
+
+
+def learning_curves(epochs):
+    """Per-source fitness by epoch."""
+    return epochs.pivot_table(index="epoch", columns="source", values=["avg_fit", "top_fit", "elite_fit"])
+
+
+def get_pyplot():
+    import matplotlib
+
+    matplotlib.use("Agg")  # headless
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def plot_game_comparison(summary, title, path):
+    plt = get_pyplot()
+    fig, ax = plt.subplots(figsize=(max(6, len(summary) * 1.2), 4))
+    means = summary["dropped_mean"]
+    errors = [means - summary["dropped_ci_low"], summary["dropped_ci_high"] - means]
+    ax.bar(range(len(summary)), means, yerr=errors, capsize=4)
+    ax.set_xticks(range(len(summary)))
+    ax.set_xticklabels(summary.index, rotation=30, ha="right")
+    ax.set_ylabel("pieces dropped (mean, 95% CI)")
+    ax.set_title(title)
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def generate_greedy_plots(results=None):
+    results = results or load_results()
+    games = results["games"]
+    if games.empty:
+        return
+    greedy = games[games["source"].str.startswith("greedy")]
+    if not greedy.empty:
+        plot_game_comparison(summarize_games(greedy), "Greedy weight presets", os.path.join(PLOTS_DIR, "greedy.png"))
+
+
+def generate_genetic_plots(results=None):
+    results = results or load_results()
+    epochs = results["epochs"]
+    if epochs.empty:
+        return
+    plt = get_pyplot()
+    curves = learning_curves(epochs)
+    fig, axes = plt.subplots(1, 3, figsize=(15, 4), sharex=True)
+    for ax, value in zip(axes, ["avg_fit", "top_fit", "elite_fit"]):
+        for source in curves[value].columns:
+            ax.plot(curves[value].index, curves[value][source], marker="o", label=source)
+        ax.set_title(value)
+        ax.set_xlabel("epoch")
+        ax.set_yscale("log")
+    axes[0].set_ylabel("pieces dropped")
+    axes[-1].legend(fontsize="small")
+    fig.tight_layout()
+    fig.savefig(os.path.join(PLOTS_DIR, "genetic.png"))
+    plt.close(fig)
+
 
+def generate_search_plots(results=None):
+    results = results or load_results()
+    games = results["games"]
+    if games.empty:
+        return
+    plot_game_comparison(summarize_games(games), "All agents", os.path.join(PLOTS_DIR, "agents.png"))
 
-def generate_greedy_plots():
-    pass
 
-def generate_genetic_plots():
-    pass
+def main(roots=None):
+    os.makedirs(PLOTS_DIR, exist_ok=True)
+    results = load_results(roots or (DATA_DIR,))
+    if not results["games"].empty:
+        summary = summarize_games(results["games"])
+        summary.to_csv(os.path.join(PLOTS_DIR, "summary.csv"))
+        print(summary[["dropped_count", "dropped_mean", "dropped_ci_low", "dropped_ci_high", "rows_mean"]].to_string())
+    if not results["epochs"].empty:
+        learning_curves(results["epochs"]).to_csv(os.path.join(PLOTS_DIR, "learning_curves.csv"))
+    generate_greedy_plots(results)
+    generate_genetic_plots(results)
+    generate_search_plots(results)
 
-def generate_search_plots():
-    pass
 
-if __name__ == 'main':
-    generate_genetic_plots()
\ No newline at end of file
+if __name__ == "__main__":
+    main(sys.argv[1:] or None)
@@ -0,0 +1,412 @@
+"""
+Differential testing of the optimized engines against reference.py.
+
+Plays long seeded games (pieces dealt like Game with the same seed) on a
+Reference_Board and a Board side by side. Before every move each selected
+check compares the reference and candidate implementations on the current
+position: placement costs, genetic ratings, chosen moves, packed MCTS boards,
+Board.apply/undo journals. After the move the two boards' cells, colors, row
+widths, column heights, cleared rows and the Board.place return value on a bad
+placement are compared. The first divergence is shrunk to a minimal board
+(rows, then cells, removed while the check still fails), printed and saved as
+JSON so it can be replayed:
+
+    python src/difftest.py --checks all --seeds 0 1 2 --pieces 2000
+    python src/difftest.py --replay difftest_repro.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from copy import deepcopy
+
+import numpy as np
+
+from board import Board
+from genetic import Genetic_AI
+from genetic_helpers import bool_to_np, get_features_batch, get_ratings
+from genetic_pruned import Pruned_Genetic_AI
+from greedy import Greedy_AI
+from mcts_array import column_heights, cost as packed_cost, pack_board, place as packed_place
+from piece import BODIES, Piece
+from reference import (
+    Reference_Board,
+    Reference_Genetic_AI,
+    Reference_Greedy_AI,
+    reference_board_cost,
+    reference_cost,
+    reference_ratings,
+)
+from reference import bool_to_np as reference_bool_to_np
+
+# Best genotype of data/genetic/old/data_15.csv, as in tournament.py
+GENOTYPE = (-0.22968359, 0.75336347, 0.0718565, -0.46594466, -0.09289146, -0.34609956, -0.29737703, -0.38998696, -0.12171042)
+
+
+def placements(board, piece):
+    """(rotated piece, x, y) in the order the agents try them."""
+    found = []
+    for i in range(4):
+        piece = piece.get_next_rotation()
+        for x in range(board.width):
+            try:
+                y = board.drop_height(piece, x)
+            except IndexError:
+                continue
+            found.append((piece, x, y))
+    return found
+
+
+def describe(piece, x):
+    return f"x={x} body={list(piece.body)}"
+
+
+def move_key(move):
+    x, piece = move
+    return x, None if piece is None else tuple(piece.body)
+
+
+def board_state(board):
+    return board.board, board.colors, board.widths, board.heights
+
+
+def compare_states(ref, cand, what):
+    for field, expected, actual in zip(["cells", "colors", "widths", "heights"], board_state(ref), board_state(cand)):
+        if expected != actual:
+            return f"{what}: {field}", expected, actual
+    return None
+
+
+def check_cost(ref, cand, piece, move, context):
+    greedy = context["greedy"]
+    for p, x, y in placements(ref, piece):
+        expected = reference_cost(ref.board, x, y, p)
+        actual = greedy.cost(cand.board, x, y, p)
+        if expected != actual:
+            return f"Greedy_AI.cost {describe(p, x)}", expected, actual
+    return None
+
+
+def check_features(ref, cand, piece, move, context):
+    found = placements(ref, piece)
+    areas = []
+    for p, x, y in found:
+        board_copy = deepcopy(ref.board)
+        for pos in p.body:
+            board_copy[y + pos[1]][x + pos[0]] = True
+        areas.append(bool_to_np(board_copy))
+        expected = reference_ratings(reference_bool_to_np(board_copy))
+        actual = get_ratings(areas[-1])
+        if not np.array_equal(expected, actual):
+            return f"get_ratings {describe(p, x)}", expected.tolist(), actual.tolist()
+    if found:
+        batch = get_features_batch(np.stack(areas))
+        for (p, x, y), area, row in zip(found, areas, batch):
+            expected = reference_ratings(area)
+            if not np.array_equal(expected, row):
+                return f"get_features_batch {describe(p, x)}", expected.tolist(), row.tolist()
+    return None
+
+
+def agent_check(reference_name, candidate_name):
+    def check(ref, cand, piece, move, context):
+        expected = move_key(context[reference_name].get_best_move(ref, piece))
+        actual = move_key(context[candidate_name].get_best_move(cand, piece))
+        if expected != actual:
+            return f"{type(context[candidate_name]).__name__}.get_best_move", expected, actual
+        return None
+
+    return check
+
+
+def check_mcts_array(ref, cand, piece, move, context):
+    rows = pack_board(cand)
+    heights = column_heights(rows, cand.width)
+    for i in range(4):
+        piece = piece.get_next_rotation()
+        for x in range(cand.width - len(piece.skirt) + 1):
+            board = deepcopy(ref)
+            y = board.drop_height(piece, x)
+            if isinstance(board.place(x, y, piece), Exception):
+                expected = None
+            else:
+                cleared = board.clear_rows()
+                expected = (pack_board(board), cleared, reference_board_cost(board.board))
+            placed = packed_place(rows, heights, piece, x, cand.width)
+            actual = None if placed is None else (placed[0], placed[1], packed_cost(placed[0], cand.width))
+            if expected != actual:
+                return f"mcts_array.place/cost {describe(piece, x)}", expected, actual
+    return None
+
+
+def check_journal(ref, cand, piece, move, context):
+    before = deepcopy(board_state(cand))
+    for p, x, y in placements(ref, piece):
+        board = deepcopy(ref)
+        if isinstance(board.place(x, y, p), Exception):
+            continue
+        board.clear_rows()
+        journal = cand.apply(x, y, p)
+        diff = compare_states(board, cand, f"Board.apply {describe(p, x)}")
+        cand.undo(journal)
+        if diff is None and board_state(cand) != before:
+            diff = f"Board.undo {describe(p, x)}", before, deepcopy(board_state(cand))
+        if diff is not None:
+            return diff
+    return None
+
+
+def check_board(ref, cand, piece, move, context):
+    """The driver's move on copies of both boards; the move itself is replayed by the runner."""
+    ref, cand = deepcopy(ref), deepcopy(cand)
+    x, chosen = move
+    y = ref.drop_height(chosen, x)
+    # A placement overlapping the stack: place() must return, not raise, and change nothing
+    if y > 0:
+        expected, actual = ref.place(x, y - 1, chosen), cand.place(x, y - 1, chosen)
+        if type(expected) is not type(actual) or str(expected) != str(actual):
+            return "Board.place on a bad placement", repr(expected), repr(actual)
+    expected = (ref.place(x, y, chosen), ref.clear_rows(), ref.top_filled())
+    actual = (cand.place(x, y, chosen), cand.clear_rows(), cand.top_filled())
+    if expected != actual:
+        return f"Board.place/clear_rows/top_filled {describe(chosen, x)}", expected, actual
+    return compare_states(ref, cand, f"after {describe(chosen, x)}")
+
+
+CHECKS = {
+    "cost": check_cost,
+    "features": check_features,
+    "greedy": agent_check("reference_greedy", "greedy"),
+    "genetic": agent_check("reference_genetic", "genetic"),
+    "genetic_pruned": agent_check("reference_genetic", "genetic_pruned"),
+    "genetic_exp": agent_check("reference_genetic_exp", "genetic_exp"),
+    "table": agent_check("reference_greedy", "table"),
+    "mcts_array": check_mcts_array,
+    "journal": check_journal,
+    "board": check_board,
+}
+# Needs data/tables/, see contour_table.py
+OPTIONAL_CHECKS = ["table"]
+
+
+def make_context(checks, genotype, width, height):
+    context = {
+        "greedy": Greedy_AI(),
+        "reference_greedy": Reference_Greedy_AI(),
+        "genetic": Genetic_AI(genotype=np.array(genotype)),
+        "genetic_pruned": Pruned_Genetic_AI(genotype=np.array(genotype)),
+        "reference_genetic": Reference_Genetic_AI(np.array(genotype)),
+        "genetic_exp": Genetic_AI(genotype=np.array(genotype), aggregate="exp"),
+        "reference_genetic_exp": Reference_Genetic_AI(np.array(genotype), aggregate="exp"),
+    }
+    if "table" in checks:
+        from contour_table import Table_AI
+
+        context["table"] = Table_AI(width=width, height=height)
+    return context
+
+
+def driver_move(driver, ref, piece, context, rng):
+    if driver == "greedy":
+        return context["reference_greedy"].get_best_move(ref, piece)
+    if driver == "genetic":
+        return context["reference_genetic"].get_best_move(ref, piece)
+    # Random legal placements reach boards with holes and overhangs quickly
+    p, x, y = rng.choice(placements(ref, piece))
+    return x, p
+
+
+def run_checks(checks, ref, cand, piece, move, context):
+    for name in checks:
+        diff = CHECKS[name](ref, cand, piece, move, context)
+        if diff is not None:
+            return name, diff
+    return None
+
+
+def load_boards(rows, width, height):
+    """Reference_Board and Board holding `rows` (bottom row first, lists of bools)."""
+    boards = []
+    for cls in (Reference_Board, Board):
+        board = cls(width, height)
+        for r, row in enumerate(rows):
+            for c, filled in enumerate(row):
+                if filled:
+                    board.board[r][c] = True
+                    board.colors[r][c] = (128, 128, 128)
+                    board.widths[r] += 1
+                    board.heights[c] = max(board.heights[c], r + 1)
+        boards.append(board)
+    return boards
+
+
+def shrink(check, rows, piece, move, context, width, height):
+    """Empty rows, then cells, while `check` still finds a divergence. Returns (rows, diff)."""
+    rows = [list(row) for row in rows]
+
+    def fails(candidate):
+        ref, cand = load_boards(candidate, width, height)
+        try:
+            return CHECKS[check](ref, cand, piece, move, context)
+        except Exception:
+            return None
+
+    diff = fails(rows)
+    for r in range(len(rows) - 1, -1, -1):
+        if any(rows[r]):
+            trial = [list(row) for row in rows]
+            trial[r] = [False] * width
+            d = fails(trial)
+            if d is not None:
+                rows, diff = trial, d
+    for r in range(len(rows) - 1, -1, -1):
+        for c in range(width):
+            if rows[r][c]:
+                trial = [list(row) for row in rows]
+                trial[r][c] = False
+                d = fails(trial)
+                if d is not None:
+                    rows, diff = trial, d
+    return rows, diff
+
+
+def render(rows, piece=None, x=None, y=None):
+    """Top-down picture of the occupied part of a board, with the piece as '@'."""
+    cells = {(y + p[1], x + p[0]) for p in piece.body} if piece is not None and y is not None else set()
+    top = max([r for r, row in enumerate(rows) if any(row)] + [r for r, _ in cells] + [0])
+    lines = []
+    for r in range(top, -1, -1):
+        lines.append("".join("@" if (r, c) in cells else "#" if filled else "." for c, filled in enumerate(rows[r])))
+    return "\n".join(lines)
+
+
+def to_json(value):
+    return json.loads(json.dumps(value, default=lambda v: v.tolist() if hasattr(v, "tolist") else repr(v)))
+
+
+def write_repro(path, report):
+    with open(path, "w") as f:
+        json.dump(to_json(report), f, indent=1)
+
+
+def play(seed, checks, context, driver="greedy", pieces=1000, width=10, height=20):
+    """
+    Play one seeded game through both implementations. Returns None if it
+    finished (or reached `pieces`) without divergence, else the report dict.
+    """
+    deal = random.Random(seed)
+    moves = random.Random(seed)
+    ref, cand = Reference_Board(width, height), Board(width, height)
+    for step in range(pieces):
+        body, color = deal.choice(BODIES)
+        piece = Piece(body, color)
+        move = driver_move(driver, ref, piece, context, moves)
+        if move[1] is None:
+            return None
+        found = run_checks(checks, ref, cand, piece, move, context)
+        if found is not None:
+            name, diff = found
+            rows, small_diff = shrink(name, ref.board, piece, move, context, width, height)
+            return {
+                "seed": seed,
+                "step": step,
+                "check": name,
+                "field": diff[0],
+                "expected": diff[1],
+                "actual": diff[2],
+                "width": width,
+                "height": height,
+                "genotype": list(context["genetic"].genotype),
+                "board": ref.board,
+                "rows": rows,
+                "minimal": small_diff,
+                "piece": [list(p) for p in body],
+                "color": list(color),
+                "move": [move[0], [list(p) for p in move[1].body]],
+            }
+        x, chosen = move
+        y = ref.drop_height(chosen, x)
+        ref.place(x, y, chosen)
+        ref.clear_rows()
+        cand.place(x, y, chosen)
+        cand.clear_rows()
+        if ref.top_filled():
+            return None
+    return None
+
+
+def print_report(report):
+    print(f"first divergence: seed {report['seed']}, step {report['step']}, check '{report['check']}'")
+    print(f"  {report['field']}")
+    print(f"  reference: {report['expected']}")
+    print(f"  candidate: {report['actual']}")
+    piece = Piece(tuple(tuple(p) for p in report["piece"]))
+    print(f"piece {list(piece.body)}, driver move {report['move']}")
+    rows = report["rows"]
+    if report["minimal"] is not None:
+        print(f"minimal board ({sum(map(sum, rows))} cells):")
+        print(render(rows))
+        print(f"  {report['minimal'][0]}")
+        print(f"  reference: {report['minimal'][1]}")
+        print(f"  candidate: {report['minimal'][2]}")
+
+
+def replay(path):
+    with open(path) as f:
+        report = json.load(f)
+    width, height = report["width"], report["height"]
+    context = make_context([report["check"]], report["genotype"], width, height)
+    piece = Piece(tuple(tuple(p) for p in report["piece"]), tuple(report["color"]))
+    move = (report["move"][0], Piece(tuple(tuple(p) for p in report["move"][1]), tuple(report["color"])))
+    for label, rows in [("minimal", report["rows"]), ("original", report["board"])]:
+        ref, cand = load_boards(rows, width, height)
+        diff = CHECKS[report["check"]](ref, cand, piece, move, context)
+        print(f"{label} board: {'still diverges: ' + repr(diff) if diff else 'no divergence'}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Differential tests of the engines against reference.py")
+    parser.add_argument("--checks", nargs="+", default=["all"], help=f"any of {', '.join(CHECKS)}, or all")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--pieces", type=int, default=1000, help="pieces per game at most")
+    parser.add_argument("--driver", choices=["greedy", "genetic", "random"], default="greedy", help="reference agent choosing the moves")
+    parser.add_argument("--genotype", default=None, help="comma separated weights for the genetic checks")
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=20)
+    parser.add_argument("--repro", default="difftest_repro.json", help="where to write the first divergence")
+    parser.add_argument("--replay", default=None, help="re-run the check of a saved divergence")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        replay(args.replay)
+        return 0
+    checks = []
+    for name in args.checks:
+        if name == "all":
+            checks += [c for c in CHECKS if c not in OPTIONAL_CHECKS and c not in checks]
+        elif name not in CHECKS:
+            parser.error(f"unknown check {name!r}")
+        elif name not in checks:
+            checks.append(name)
+    genotype = [float(w) for w in args.genotype.split(",")] if args.genotype else GENOTYPE
+    context = make_context(checks, genotype, args.width, args.height)
+    # The board comparison after each move is always on
+    checks = [c for c in checks if c != "board"] + ["board"]
+
+    for seed in args.seeds:
+        start = time.perf_counter()
+        report = play(seed, checks, context, args.driver, args.pieces, args.width, args.height)
+        if report is not None:
+            print_report(report)
+            write_repro(args.repro, report)
+            print(f"written to {args.repro}; replay with: python {sys.argv[0]} --replay {args.repro}")
+            return 1
+        print(f"seed {seed}: no divergence ({time.perf_counter() - start:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""
+Distributed fitness evaluation: a coordinator hands out (genotype, seed) jobs
+to worker processes over TCP, possibly on other machines.
+
+    # on the training machine, inside run_X_epochs(..., evaluator='distributed', coordinator=Coordinator(port=5555))
+    # on each worker machine
+    python src/distributed.py worker --host <coordinator> --port 5555 --batch 8
+
+Messages are length-prefixed binary frames. Workers ask for a batch of jobs,
+which is leased to them, and send each game's result as soon as it is played;
+every result renews the lease on the rest of the batch, so `lease_seconds`
+bounds one game, not the whole batch. If the connection drops or the lease
+expires the jobs go back to the queue and are handed to another worker. A game
+that raises is reported as failed and queued again; a job leased
+`max_attempts` times without a result (say, one that crashes every worker it
+reaches) fails the evaluate() call that submitted it. Workers reconnect after
+`retry_seconds` whenever the coordinator goes away. Results are packed as
+(job id, pieces dropped, rows cleared) triples, failures as the job id and
+the error.
+"""
+
+import argparse
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+NUM_FEATURES = 9
+AGGREGATES = ["lin", "exp"]
+
+FRAME = struct.Struct("<I")
+JOB = struct.Struct(f"<IQB{NUM_FEATURES}d")  # job id, seed, aggregate, genotype
+RESULT = struct.Struct("<III")  # job id, pieces dropped, rows cleared
+FAILURE = struct.Struct("<I")  # job id, followed by the error text
+COUNT = struct.Struct("<H")
+
+REQUEST, JOBS, WAIT, DONE, FAILED = b"R", b"J", b"W", b"D", b"F"
+
+
+def send_message(sock, kind, payload=b""):
+    sock.sendall(FRAME.pack(len(payload) + 1) + kind + payload)
+
+
+def recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_message(sock):
+    """Return (kind, payload), or None once the peer has closed the connection."""
+    header = recv_exact(sock, FRAME.size)
+    if header is None:
+        return None
+    body = recv_exact(sock, FRAME.unpack(header)[0])
+    if body is None:
+        return None
+    return body[:1], body[1:]
+
+
+def pack_jobs(jobs):
+    return COUNT.pack(len(jobs)) + b"".join(
+        JOB.pack(job_id, seed, aggregate, *genotype) for job_id, (genotype, seed, aggregate) in jobs
+    )
+
+
+def unpack_jobs(payload):
+    (count,) = COUNT.unpack_from(payload)
+    jobs = []
+    for i in range(count):
+        job_id, seed, aggregate, *genotype = JOB.unpack_from(payload, COUNT.size + i * JOB.size)
+        jobs.append((job_id, np.array(genotype), seed, AGGREGATES[aggregate]))
+    return jobs
+
+
+def pack_results(results):
+    return b"".join(RESULT.pack(*r) for r in results)
+
+
+def unpack_results(payload):
+    return [RESULT.unpack_from(payload, i) for i in range(0, len(payload), RESULT.size)]
+
+
+class Coordinator:
+    """
+    Job queue served over TCP. evaluate() blocks until every job of the call
+    has a result, so it can stand in for a local evaluator.
+    """
+
+    def __init__(self, host="0.0.0.0", port=5555, lease_seconds=600.0, max_batch=64, max_attempts=3):
+        self.lease_seconds = lease_seconds
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.cond = threading.Condition()
+        self.jobs = {}  # job id -> (genotype, seed, aggregate index)
+        self.pending = deque()
+        self.leases = {}  # job id -> (connection id, deadline)
+        self.results = {}  # job id -> (pieces dropped, rows cleared)
+        self.attempts = {}  # job id -> number of times it was leased
+        self.failed = set()  # jobs that used up their attempts
+        self.errors = {}  # job id -> last error a worker reported for it
+        self.connections = set()  # open worker sockets
+        self.next_job = 0
+
+        coordinator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                coordinator.serve(self.request)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        # Hang up on connected workers too, so they go back to reconnecting
+        with self.cond:
+            for sock in list(self.connections):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def lease(self, connection, n):
+        """Take up to n pending jobs for a connection, waiting briefly if there are none."""
+        with self.cond:
+            self.requeue_expired()
+            if not self.pending:
+                self.cond.wait(timeout=1.0)
+            deadline = time.monotonic() + self.lease_seconds
+            batch = []
+            while self.pending and len(batch) < n:
+                job_id = self.pending.popleft()
+                # Stale entries: finished, already leased again, or given up on
+                if job_id not in self.jobs or job_id in self.results or job_id in self.leases or job_id in self.failed:
+                    continue
+                if self.attempts[job_id] >= self.max_attempts:
+                    self.failed.add(job_id)
+                    self.cond.notify_all()
+                    continue
+                self.attempts[job_id] += 1
+                self.leases[job_id] = (connection, deadline)
+                batch.append((job_id, self.jobs[job_id]))
+            return batch
+
+    def requeue_expired(self):
+        now = time.monotonic()
+        for job_id, (connection, deadline) in list(self.leases.items()):
+            if deadline < now:
+                del self.leases[job_id]
+                if job_id not in self.results:
+                    self.pending.append(job_id)
+
+    def renew(self, connection):
+        """Extend the leases of a connection that is still making progress."""
+        deadline = time.monotonic() + self.lease_seconds
+        for job_id, (owner, _) in list(self.leases.items()):
+            if owner == connection:
+                self.leases[job_id] = (connection, deadline)
+
+    def release(self, connection):
+        """Put back every job leased to a connection that went away."""
+        with self.cond:
+            for job_id, (owner, deadline) in list(self.leases.items()):
+                if owner == connection:
+                    del self.leases[job_id]
+                    if job_id not in self.results:
+                        self.pending.appendleft(job_id)
+            self.cond.notify_all()
+
+    def serve(self, sock):
+        connection = id(sock)
+        with self.cond:
+            self.connections.add(sock)
+        try:
+            while True:
+                message = recv_message(sock)
+                if message is None:
+                    break
+                kind, payload = message
+                if kind == REQUEST:
+                    (n,) = COUNT.unpack(payload)
+                    batch = self.lease(connection, min(n, self.max_batch))
+                    if batch:
+                        send_message(sock, JOBS, pack_jobs(batch))
+                    else:
+                        send_message(sock, WAIT)
+                elif kind == DONE:
+                    with self.cond:
+                        for job_id, dropped, rows in unpack_results(payload):
+                            # Late results of a re-leased job are kept only once
+                            if job_id in self.jobs and job_id not in self.results:
+                                self.results[job_id] = (dropped, rows)
+                                self.leases.pop(job_id, None)
+                        self.renew(connection)
+                        self.cond.notify_all()
+                elif kind == FAILED:
+                    (job_id,) = FAILURE.unpack_from(payload)
+                    with self.cond:
+                        # Queued again; max_attempts decides when to give up
+                        if self.leases.get(job_id, (None,))[0] == connection:
+                            del self.leases[job_id]
+                            self.errors[job_id] = payload[FAILURE.size :].decode(errors="replace")
+                            self.pending.append(job_id)
+                        self.renew(connection)
+                        self.cond.notify_all()
+        except OSError:
+            pass
+        finally:
+            with self.cond:
+                self.connections.discard(sock)
+            self.release(connection)
+
+    def evaluate(self, genotypes, seeds, aggregate="lin"):
+        """
+        Play every genotype on every seed on the workers. Returns
+        (pieces_dropped, rows_cleared), each of shape (pop_size, len(seeds)).
+        Raises RuntimeError if a job failed `max_attempts` times.
+        """
+        genotypes = np.asarray(genotypes, dtype=float)
+        ids = np.zeros((len(genotypes), len(seeds)), dtype=int)
+        with self.cond:
+            for a, genotype in enumerate(genotypes):
+                for t, seed in enumerate(seeds):
+                    job_id = self.next_job
+                    self.next_job += 1
+                    self.jobs[job_id] = (genotype, seed, AGGREGATES.index(aggregate))
+                    self.attempts[job_id] = 0
+                    self.pending.append(job_id)
+                    ids[a, t] = job_id
+            self.cond.notify_all()
+            own = set(ids.flat)
+            while not all(job_id in self.results or job_id in self.failed for job_id in own):
+                self.cond.wait(timeout=1.0)
+                self.requeue_expired()
+                # Nobody may ask for jobs again: give up on exhausted jobs here too
+                for job_id in own - self.results.keys() - self.leases.keys() - self.failed:
+                    if self.attempts[job_id] >= self.max_attempts:
+                        self.failed.add(job_id)
+            failed = sorted(own & self.failed - self.results.keys())
+            if failed:
+                failed_job = self.jobs[failed[0]]
+                error = self.errors.get(failed[0])
+            else:
+                pieces_dropped = np.array([[self.results[j][0] for j in row] for row in ids])
+                rows_cleared = np.array([[self.results[j][1] for j in row] for row in ids])
+            # Forget the call's jobs, including entries still queued or leased
+            self.pending = deque(job_id for job_id in self.pending if job_id not in own)
+            for job_id in own:
+                self.jobs.pop(job_id)
+                self.results.pop(job_id, None)
+                self.leases.pop(job_id, None)
+                self.attempts.pop(job_id)
+                self.failed.discard(job_id)
+                self.errors.pop(job_id, None)
+        if failed:
+            genotype, seed, _ = failed_job
+            raise RuntimeError(
+                f"{len(failed)} job(s) got no result after {self.max_attempts} attempts, first: seed {seed}, "
+                f"genotype {np.asarray(genotype).tolist()}" + (f", last error: {error}" if error else "")
+            )
+        return pieces_dropped, rows_cleared
+
+
+def run_worker(host, port, batch=8, retry_seconds=5.0, monitor=None):
+    """
+    Evaluate jobs from a coordinator, reconnecting whenever the connection goes away.
+    With `monitor` ('host:port'), games publish snapshots there for monitor.py.
+    """
+    from game import Game
+    from genetic import Genetic_AI
+    from monitor import SnapshotPublisher, with_run_id
+
+    monitor = with_run_id(monitor)
+    while True:
+        try:
+            sock = socket.create_connection((host, port))
+        except OSError:
+            time.sleep(retry_seconds)
+            continue
+        with sock:
+            try:
+                while True:
+                    send_message(sock, REQUEST, COUNT.pack(batch))
+                    message = recv_message(sock)
+                    if message is None:
+                        break
+                    kind, payload = message
+                    if kind == WAIT:
+                        continue
+                    for job_id, genotype, seed, aggregate in unpack_jobs(payload):
+                        try:
+                            agent = Genetic_AI(genotype=genotype, aggregate=aggregate)
+                            publisher = None if monitor is None else SnapshotPublisher(monitor, job_id)
+                            game = Game("genetic", agent=agent, seed=seed, recorder=publisher)
+                            dropped, rows = game.run_no_visual(verbose=False)
+                            if publisher is not None:
+                                publisher.publish(game.board, done=True)
+                        except Exception as e:
+                            # One bad game must not take the worker down with it
+                            print(f"job {job_id} (seed {seed}) failed: {e!r}", file=sys.stderr)
+                            send_message(sock, FAILED, FAILURE.pack(job_id) + repr(e).encode())
+                            continue
+                        # One result per game keeps the rest of the batch's lease alive
+                        send_message(sock, DONE, pack_results([(job_id, dropped, rows)]))
+            except OSError:
+                pass
+        # Jobs leased on the lost connection go back to the coordinator's queue
+        time.sleep(retry_seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed fitness evaluation worker")
+    parser.add_argument("role", choices=["worker"])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--batch", type=int, default=8, help="jobs requested per message")
+    parser.add_argument("--retry-seconds", type=float, default=5.0, help="wait before reconnecting")
+    parser.add_argument("--monitor", default=None, metavar="[HOST:]PORT", help="publish board snapshots for main.py monitor --attach")
+    args = parser.parse_args(argv)
+    run_worker(args.host, args.port, batch=args.batch, retry_seconds=args.retry_seconds, monitor=args.monitor)
+
+
+if __name__ == "__main__":
+    main()
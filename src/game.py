@@ -4,8 +4,14 @@ from board import Board
 from time import sleep
 from greedy import Greedy_AI
 from genetic import Genetic_AI
+from genetic_pruned import Pruned_Genetic_AI
 from mcts import MCTS_AI
-from piece import Piece
+from mcts_array import Array_MCTS_AI
+from contour_table import Table_AI
+from piece import BODIES, Piece
+from time import perf_counter
+import instrumentation
+import random
 import pygame
 
 BLACK = 0, 0, 0
@@ -13,40 +19,71 @@ WHITE = 147, 151, 153
 GREEN = (0, 255, 0)
 
 class Game:
-    def __init__(self, mode, agent=None):
-        self.board = Board()
-        self.curr_piece = Piece()
-        self.y = 20
-        self.x = 5
+    def __init__(self, mode, agent=None, seed=None, width=10, height=20, recorder=None, pieces=None):
+        self.board = Board(width, height)
+        self.recorder = recorder  # Optional trajectories.TrajectoryWriter
+        self.rng = random.Random(seed)  # Piece sequence source, reproducible when seeded
+        self.pieces = pieces  # Optional iterator of BODIES indices, used instead of rng
+        self.curr_piece = self.next_piece()
+        self.spawn_x = width // 2
+        self.spawn_y = height
+        self.y = self.spawn_y
+        self.x = self.spawn_x
         self.screenWidth = 700  # Increased width to accommodate stats display
         self.screenHeight = 1000
         self.top = 0
         self.pieces_dropped = 0
         self.rows_cleared = 0
         if mode == "greedy":
-            self.ai = Greedy_AI()
+            self.ai = Greedy_AI() if agent is None else agent
         elif mode == "genetic":
             if agent is None:
                 self.ai = Genetic_AI()
             else:
                 self.ai = agent
+        elif mode == "genetic_pruned":
+            self.ai = Pruned_Genetic_AI() if agent is None else agent
         elif mode == "mcts":
             self.ai = MCTS_AI()
+        elif mode == "mcts_array":
+            self.ai = Array_MCTS_AI(width=width, height=height)
+        elif mode == "table":
+            self.ai = Table_AI(width=width, height=height)
         else:
             self.ai = None
 
-    def run_no_visual(self):
+    def next_piece(self):
+        if self.pieces is not None:
+            body, color = BODIES[next(self.pieces)]
+            return Piece(body, color)
+        body, color = self.rng.choice(BODIES)
+        return Piece(body, color)
+
+    def run_no_visual(self, verbose=True, max_pieces=None):
+        """Play until the top is filled, or `max_pieces` pieces were dropped."""
         if self.ai is None:
             return -1
+        stats = instrumentation.active
         while True:
+            if stats:
+                start = perf_counter()
             x, piece = self.ai.get_best_move(self.board, self.curr_piece)
+            if stats:
+                stats.decision(perf_counter() - start)
+            dealt = self.curr_piece
             self.curr_piece = piece
             y = self.board.drop_height(self.curr_piece, x)
+            if self.recorder is not None:
+                rows_before = self.rows_cleared
+                self.recorder.record(self.board, dealt, x, y, piece)
             self.drop(y, x=x)
-            if self.board.top_filled():
+            if self.recorder is not None:
+                self.recorder.set_last_reward(self.rows_cleared - rows_before)
+            if self.board.top_filled() or self.pieces_dropped == max_pieces:
                 break
-        print("Pieces Dropped:", self.pieces_dropped)
-        print("Rows Cleared:", self.rows_cleared)
+        if verbose:
+            print("Pieces Dropped:", self.pieces_dropped)
+            print("Rows Cleared:", self.rows_cleared)
         return self.pieces_dropped, self.rows_cleared
 
     def run(self):
@@ -105,7 +142,7 @@ class Game:
                         if self.x - 1 >= 0:
                             occupied = False
                             for b in self.curr_piece.body:
-                                if self.y + b[1] >= self.board.width:
+                                if self.y + b[1] >= self.board.height + 4:
                                     continue
                                 if self.board.board[self.y + b[1]][self.x + b[0] - 1]:
                                     occupied = True
@@ -116,7 +153,7 @@ class Game:
                         if self.x + 1 <= self.board.width - len(self.curr_piece.skirt):
                             occupied = False
                             for b in self.curr_piece.body:
-                                if self.y + b[1] >= self.board.width:
+                                if self.y + b[1] >= self.board.height + 4:
                                     continue
                                 if self.board.board[self.y + b[1]][self.x + b[0] + 1]:
                                     occupied = True
@@ -144,9 +181,9 @@ class Game:
         if x is None:
             x = self.x
         self.board.place(x, y, self.curr_piece)
-        self.x = 5
-        self.y = 20
-        self.curr_piece = Piece()
+        self.x = self.spawn_x
+        self.y = self.spawn_y
+        self.curr_piece = self.next_piece()
         self.pieces_dropped += 1
         self.rows_cleared += self.board.clear_rows()
 
@@ -161,7 +198,7 @@ class Game:
             start = (0, row * self.pieceHeight + self.top)
             end = (self.screenWidth - 200, row * self.pieceHeight + self.top)
             pygame.draw.line(self.screen, WHITE, start, end, width=2)
-        for col in range(1, self.board.height):
+        for col in range(1, self.board.width):
             start = (col * self.pieceWidth, self.top)
             end = (col * self.pieceWidth, self.screenHeight)
             pygame.draw.line(self.screen, WHITE, start, end, width=2)
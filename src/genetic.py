@@ -2,6 +2,18 @@ import numpy as np
 from copy import copy, deepcopy
 import random
 from genetic_helpers import * 
+from time import perf_counter
+import instrumentation
+
+RATINGS = ['agg_height', 'n_holes', 'bumpiness', 'num_pits', 'max_wells',
+           'n_cols_with_holes', 'row_transitions', 'col_transitions', 'cleared']
+
+# only linear will work right now, need to extend genotype for exponents to add more
+AGGREGATE_FUNCS = {
+    'lin': lambda gene, ratings: np.dot(ratings, gene),
+    'exp': lambda gene, ratings: np.dot(np.array([ratings[i]**gene[i] for i in range(len(ratings))]), gene),
+    'disp': 0
+}
 
 
 class Genetic_AI:
@@ -31,32 +43,8 @@ class Genetic_AI:
         """
         """
 
-        peaks = get_peaks(board)
-        highest_peak = np.max(peaks)
-        holes = get_holes(peaks, board)
-        wells = get_wells(peaks)
-
-        rating_funcs = {
-            'agg_height': np.sum(peaks),
-            'n_holes': np.sum(holes),
-            'bumpiness': get_bumpiness(peaks),
-            'num_pits': np.count_nonzero(np.count_nonzero(board, axis=0) == 0),
-            'max_wells': np.max(wells),
-            'n_cols_with_holes': np.count_nonzero(np.array(holes) > 0),
-            'row_transitions': get_row_transition(board, highest_peak), 
-            'col_transitions': get_col_transition(board, peaks),
-            'cleared': np.count_nonzero(np.mean(board, axis=1))
-        } 
-
-        # only linear will work right now, need to extend genotype for exponents to add more
-        aggregate_funcs = {
-            'lin': lambda gene, ratings: np.dot(ratings, gene), 
-            'exp': lambda gene, ratings: np.dot(np.array([ratings[i]**gene[i] for i in range(len(ratings))]), gene), 
-            'disp': 0 
-        }
-
-        ratings = np.array([*rating_funcs.values()], dtype=float)
-        aggregate_rating = aggregate_funcs[aggregate](self.genotype, ratings)
+        ratings = get_ratings(board)
+        aggregate_rating = AGGREGATE_FUNCS[aggregate](self.genotype, ratings)
 
         return aggregate_rating
 
@@ -69,20 +57,36 @@ class Genetic_AI:
         best_x = -1000
         max_value = -1000
         best_piece = None
+        stats = instrumentation.active
+        if stats:
+            t = perf_counter()
+        base_board = bool_to_np(board.board)
+        if stats:
+            t = stats.lap("to_numpy", t)
         for i in range(4):
             piece = piece.get_next_rotation()
+            if stats:
+                t = stats.lap("rotation", t)
             for x in range(board.width):
                 try:
                     y = board.drop_height(piece, x)
                 except:
                     continue
+                finally:
+                    if stats:
+                        t = stats.lap("drop_height", t)
 
-                board_copy = deepcopy(board.board)
+                np_board = base_board.copy()
                 for pos in piece.body:
-                    board_copy[y + pos[1]][x + pos[0]] = True
-                
-                np_board = bool_to_np(board_copy)
-                c = self.valuate(np_board)
+                    np_board[y + pos[1], x + pos[0]] = 1
+                if stats:
+                    t = stats.lap("copy", t)
+
+                c = self.valuate(np_board, self.aggregate)
+                if stats:
+                    t = stats.lap("features", t)
+                    stats.count("placements")
+                    stats.count("board_copies")
                 
                 if c > max_value:
                     max_value = c
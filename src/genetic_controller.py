@@ -2,6 +2,12 @@ from os import pardir  # Import for navigating file paths
 import numpy as np  # Import for numerical operations
 from game import Game  # Import the Game class
 from genetic import Genetic_AI  # Import the Genetic_AI class
+from lockstep import play_population  # Import the lockstep population evaluator
+from shared_eval import SharedEvaluator  # Import the shared-memory pool evaluator
+from survival import SurvivalEstimator  # Import the prefix-game fitness estimator
+from optimizers import CMAES, CrossEntropy  # Import the population optimizers
+from telemetry import Telemetry  # Import the progress publisher
+from monitor import SnapshotPublisher, with_run_id  # Import the board snapshot publisher for the monitor
 import random  # Import for random number generation
 import pandas as pd  # Import for data manipulation and saving to CSV
 
@@ -22,25 +28,113 @@ def cross(a1, a2, aggregate="lin"):
     # Create and return a new Genetic_AI agent with the new genotype
     return Genetic_AI(genotype=np.array(new_genotype), aggregate=aggregate, mutate=True)
 
-def compute_fitness(agent, num_trials):
+def compute_fitness(agent, num_trials, telemetry=None, monitor=None, slot=0):
     """
     Evaluate the agent's performance over a number of trials.
+    With `monitor` ('host:port'), trial i publishes board snapshots there as game slot * num_trials + i.
     """
     fitness = []  # List to store fitness scores from each trial
     
-    for _ in range(num_trials):
-        game = Game('genetic', agent=agent)  # Create a new game with the agent
-        peices_dropped, rows_cleared = game.run_no_visual()  # Run the game and get performance metrics
+    for i in range(num_trials):
+        publisher = None if monitor is None else SnapshotPublisher(monitor, slot * num_trials + i)  # Optional monitor feed
+        game = Game('genetic', agent=agent, recorder=publisher)  # Create a new game with the agent
+        peices_dropped, rows_cleared = game.run_no_visual(verbose=False)  # Run the game and get performance metrics
+        if publisher is not None:
+            publisher.publish(game.board, done=True)
         fitness.append(peices_dropped)  # Add the number of pieces dropped to the list
-        print(f"    Trial: {_}/{num_trials}")  # Print progress
+        if telemetry is not None:
+            telemetry.game(peices_dropped)  # Progress goes to the metrics file, not stdout
 
     # Return the average fitness score
     return np.average(np.array(fitness))
 
-def run_X_epochs(num_epochs=10, num_trials=5, pop_size=100, aggregate='lin', num_elite=5, survival_rate=.35, logging_file='default.csv'):
+def compute_population_fitness(genotypes, num_trials, aggregate='lin', monitor=None):
+    """
+    Evaluate a (pop_size, 9) genotype matrix in lockstep on the same num_trials piece sequences.
+    """
+    seeds = [random.randrange(2 ** 32) for _ in range(num_trials)]  # Shared piece sequences
+    pieces_dropped, rows_cleared = play_population(genotypes, seeds, aggregate=aggregate, monitor=monitor)
+
+    # Average fitness score of each agent
+    return pieces_dropped.mean(axis=1)
+
+def make_evaluator(evaluator, workers=None):
+    """
+    The pool-backed evaluator a run keeps for all its epochs when no coordinator is given,
+    with `workers` processes (None for the evaluator's default), or None if it needs none.
+    """
+    if evaluator == 'shared':
+        return SharedEvaluator(workers=workers)
+    if evaluator == 'survival':
+        return SurvivalEstimator(workers=workers)
+    return None
+
+def evaluate_genotypes(genotypes, num_trials, aggregate='lin', evaluator='serial', coordinator=None, telemetry=None, monitor=None, workers=None):
+    """
+    Fitness of each row of a genotype matrix, with any evaluator of run_X_epochs.
+    Without a coordinator, 'shared' and 'survival' start a `workers` sized evaluator for this call only.
+    With `monitor` ('host:port'), the games publish board snapshots there for
+    `main.py monitor --attach` (distributed workers take it as `--monitor` instead).
+    """
+    monitor = with_run_id(monitor)  # Keeps the run's id if it has one
+    if evaluator == 'serial':
+        fitness = []
+        for n, g in enumerate(genotypes):
+            agent = Genetic_AI(genotype=g, aggregate=aggregate)
+            fitness.append(compute_fitness(agent, num_trials=num_trials, telemetry=telemetry, monitor=monitor, slot=n))
+            if telemetry is not None:
+                telemetry.agents(fitness[-1:])
+        return np.array(fitness)
+
+    if evaluator == 'lockstep':
+        fitness = compute_population_fitness(genotypes, num_trials, aggregate=aggregate, monitor=monitor)
+    elif evaluator == 'distributed':
+        # Jobs go to the workers connected to the coordinator (see distributed.py)
+        seeds = [random.randrange(2 ** 32) for _ in range(num_trials)]
+        pieces_dropped, rows_cleared = coordinator.evaluate(genotypes, seeds, aggregate=aggregate)
+        fitness = pieces_dropped.mean(axis=1)
+    elif evaluator == 'shared':
+        # Local process pool reading genotypes and piece sequences from shared memory (see shared_eval.py)
+        seeds = [random.randrange(2 ** 32) for _ in range(num_trials)]
+        if coordinator is None:
+            with SharedEvaluator(workers=workers) as shared:
+                pieces_dropped, rows_cleared = shared.evaluate(genotypes, seeds, aggregate=aggregate, monitor=monitor)
+        else:
+            pieces_dropped, rows_cleared = coordinator.evaluate(genotypes, seeds, aggregate=aggregate, monitor=monitor)
+        fitness = pieces_dropped.mean(axis=1)
+    elif evaluator == 'survival':
+        # Expected pieces to top-out extrapolated from game prefixes (see survival.py)
+        seeds = [random.randrange(2 ** 32) for _ in range(num_trials)]
+        estimator = SurvivalEstimator(workers=workers) if coordinator is None else coordinator
+        pieces = estimator.pieces
+        fitness, low, high, estimates = estimator.evaluate(genotypes, seeds, aggregate=aggregate, monitor=monitor)
+        if telemetry is not None:
+            # Count the pieces actually played, not the extrapolated ones
+            telemetry.game(estimator.pieces - pieces, n=len(fitness) * num_trials)
+            telemetry.agents(fitness)
+        return fitness
+    else:
+        raise ValueError(f"Unknown evaluator '{evaluator}'")
+    if telemetry is not None:
+        telemetry.game(fitness.sum() * num_trials, n=len(fitness) * num_trials)
+        telemetry.agents(fitness)
+    return fitness
+
+def run_X_epochs(num_epochs=10, num_trials=5, pop_size=100, aggregate='lin', num_elite=5, survival_rate=.35, logging_file='default.csv', evaluator='serial', coordinator=None, telemetry=None, monitor=None, workers=None):
     """
     Run the genetic algorithm for a given number of epochs.
+    evaluator='lockstep' plays the whole population together on shared piece sequences,
+    evaluator='distributed' sends the games to the workers of a distributed.Coordinator,
+    evaluator='shared' plays them on a local shared_eval.SharedEvaluator,
+    evaluator='survival' only plays game prefixes and estimates the rest with a survival.SurvivalEstimator.
+    Unless one is passed as coordinator, the run keeps one 'shared' or 'survival' evaluator
+    with `workers` processes (default: all cores for 'shared', none for 'survival') for all epochs.
+    Progress is published by `telemetry` (by default a telemetry.Telemetry named after logging_file),
+    and with `monitor` ('host:port') the games send board snapshots to `main.py monitor --attach`.
     """
+    own_telemetry = telemetry is None
+    if own_telemetry:
+        telemetry = Telemetry(logging_file)
     # Initialize data collection
     data=[[1, np.ones(9), 1, np.ones(9), 1, np.ones(9)]]
     headers = ['avg_fit','avg_gene', 'top_fit', 'top_gene', 'elite_fit', 'elite_gene']
@@ -50,6 +144,11 @@ def run_X_epochs(num_epochs=10, num_trials=5, pop_size=100, aggregate='lin', num
     # Create the initial population of agents
     population = [Genetic_AI(aggregate=aggregate) for _ in range(pop_size)]
 
+    monitor = with_run_id(monitor)  # One run id for every epoch's games
+    own_evaluator = coordinator is None and evaluator in ('shared', 'survival')
+    if own_evaluator:
+        coordinator = make_evaluator(evaluator, workers)  # One pool for the whole run
+
     for epoch in range(num_epochs):
         """
         Evaluate fitness of each agent.
@@ -57,11 +156,19 @@ def run_X_epochs(num_epochs=10, num_trials=5, pop_size=100, aggregate='lin', num
         total_fitness = 0  # Total fitness of the population
         top_agent = 0  # The agent with the highest fitness
         gene = np.zeros(9)  # Placeholder for cumulative genotype
+        telemetry.start_epoch(epoch, num_epochs, pop_size)
+
+        if evaluator != 'serial':
+            genotypes = np.array([agent.genotype for agent in population])
+            scores = evaluate_genotypes(genotypes, num_trials, aggregate=aggregate, evaluator=evaluator, coordinator=coordinator, telemetry=telemetry, monitor=monitor)
+            for agent, score in zip(population, scores):
+                agent.fit_score = score
 
         for n in range(pop_size):
-            print(f"Agent: {n}/{pop_size}")  # Print progress
             agent = population[n]
-            agent.fit_score = compute_fitness(agent, num_trials=num_trials)  # Compute fitness
+            if evaluator == 'serial':
+                agent.fit_score = compute_fitness(agent, num_trials=num_trials, telemetry=telemetry, monitor=monitor, slot=n)  # Compute fitness
+                telemetry.agents([agent.fit_score])
             total_fitness += agent.fit_score  # Update total fitness
             gene += agent.genotype  # Accumulate genotypes
 
@@ -113,6 +220,63 @@ def run_X_epochs(num_epochs=10, num_trials=5, pop_size=100, aggregate='lin', num
 
         population = next_gen  # Set the population for the next epoch
 
+    if own_evaluator and isinstance(coordinator, SharedEvaluator):
+        coordinator.close()  # Stop the pool the run started
+    if own_telemetry:
+        telemetry.close()
+    else:
+        telemetry.publish()
+    return data
+
+def run_optimizer_epochs(method='cma', num_epochs=10, num_trials=5, pop_size=100, aggregate='lin', num_elite=5, logging_file='default.csv', evaluator='lockstep', seed=None, coordinator=None, telemetry=None, monitor=None, workers=None):
+    """
+    Search the Genetic_AI weights with CMA-ES (method='cma') or the cross-entropy
+    method (method='cem') instead of crossover and mutation. Logs the same columns
+    as run_X_epochs, and publishes progress and board snapshots (`monitor`) and
+    keeps its evaluator (`workers`) like it.
+    """
+    # Bad arguments fail here, before anything is written or played
+    if method == 'cma':
+        optimizer = CMAES(pop_size, seed=seed)
+    elif method == 'cem':
+        optimizer = CrossEntropy(pop_size, seed=seed)
+    else:
+        raise ValueError(f"Unknown optimizer '{method}'")
+
+    own_telemetry = telemetry is None
+    if own_telemetry:
+        telemetry = Telemetry(logging_file)
+    headers = ['avg_fit','avg_gene', 'top_fit', 'top_gene', 'elite_fit', 'elite_gene']
+    data = [[1, np.ones(9), 1, np.ones(9), 1, np.ones(9)]]
+    df = pd.DataFrame(data, columns=headers)
+    df.to_csv(f'data/{logging_file}.csv', index=False)  # Save initial data to CSV
+
+    monitor = with_run_id(monitor)  # One run id for every epoch's games
+    own_evaluator = coordinator is None and evaluator in ('shared', 'survival')
+    if own_evaluator:
+        coordinator = make_evaluator(evaluator, workers)  # One pool for the whole run
+
+    for epoch in range(num_epochs):
+        telemetry.start_epoch(epoch, num_epochs, pop_size)
+        genotypes = optimizer.ask()  # One row per agent
+        fitness = evaluate_genotypes(genotypes, num_trials, aggregate=aggregate, evaluator=evaluator, coordinator=coordinator, telemetry=telemetry, monitor=monitor)
+        optimizer.tell(genotypes, fitness)
+
+        order = np.argsort(-fitness)
+        elite = order[:num_elite]
+        data = [[fitness.mean(), genotypes.mean(axis=0), fitness[order[0]], genotypes[order[0]],
+                 fitness[elite].mean(), genotypes[elite].mean(axis=0)]]
+        df = pd.DataFrame(data, columns=headers)
+        df.to_csv(f'data/{logging_file}.csv', mode='a', index=False, header=False)
+
+        print(f'\nEpoch {epoch}: \n    total fitness: {fitness.mean()}\n    best agent: {fitness[order[0]]}\n')
+
+    if own_evaluator and isinstance(coordinator, SharedEvaluator):
+        coordinator.close()  # Stop the pool the run started
+    if own_telemetry:
+        telemetry.close()
+    else:
+        telemetry.publish()
     return data
 
 if __name__ == '__main__':
@@ -6,61 +6,38 @@ Helper Functions
 
 
 def bool_to_np(board):
-    f = lambda x: 1 if x == True else 0
-    return np.asarray([[f(j) for j in i] for i in board])
+    return np.asarray(board, dtype=int)
 
 
 def get_peaks(area):
-    #
-    peaks = np.array([])
-    for col in range(area.shape[1]):
-        if 1 in area[:, col]:
-            p = area.shape[0] - np.argmax(area[:, col], axis=0)
-            peaks = np.append(peaks, p)
-        else:
-            peaks = np.append(peaks, 0)
-    return peaks
+    # Distance from the bottom of the array to the first filled cell of each column
+    filled = area.any(axis=0)
+    peaks = np.where(filled, area.shape[0] - np.argmax(area, axis=0), 0)
+    return peaks.astype(float)
 
 
 def get_row_transition(area, highest_peak):
-    sum = 0
     # From highest peak to bottom
-    for row in range(int(area.shape[0] - highest_peak), area.shape[0]):
-        for col in range(1, area.shape[1]):
-            if area[row, col] != area[row, col - 1]:
-                sum += 1
-    return sum
+    rows = area[int(area.shape[0] - highest_peak) :]
+    return int(np.count_nonzero(rows[:, 1:] != rows[:, :-1]))
 
 
 def get_col_transition(area, peaks):
-    sum = 0
-    for col in range(area.shape[1]):
-        if peaks[col] <= 1:
-            continue
-        for row in range(int(area.shape[0] - peaks[col]), area.shape[0] - 1):
-            if area[row, col] != area[row + 1, col]:
-                sum += 1
-    return sum
+    # Row pairs (row, row + 1) below each column's peak, for columns with peak > 1
+    rows = np.arange(area.shape[0] - 1)[:, None]
+    below_peak = (rows >= area.shape[0] - peaks[None, :]) & (peaks[None, :] > 1)
+    return int(np.count_nonzero((area[1:] != area[:-1]) & below_peak))
 
 
 def get_bumpiness(peaks):
-    s = 0
-    for i in range(9):
-        s += np.abs(peaks[i] - peaks[i + 1])
-    return s
+    return np.sum(np.abs(np.diff(peaks)))
 
 
 def get_holes(peaks, area):
     # Count from peaks to bottom
-    holes = []
-    for col in range(area.shape[1]):
-        start = -peaks[col]
-        # If there's no holes i.e. no blocks on that column
-        if start == 0:
-            holes.append(0)
-        else:
-            holes.append(np.count_nonzero(area[int(start) :, col] == 0))
-    return holes
+    rows = np.arange(area.shape[0])[:, None]
+    below_peak = rows >= area.shape[0] - peaks[None, :]
+    return np.count_nonzero((area == 0) & below_peak, axis=0)
 
 
 def get_wells(peaks):
@@ -82,3 +59,60 @@ def get_wells(peaks):
             w = w1 if w1 >= w2 else w2
             wells.append(w)
     return wells
+
+
+def get_ratings(area):
+    """The nine Genetic_AI.valuate ratings of one board, in genetic.RATINGS order."""
+    peaks = get_peaks(area)
+    highest_peak = np.max(peaks)
+    holes = get_holes(peaks, area)
+    wells = get_wells(peaks)
+    return np.array([
+        np.sum(peaks),
+        np.sum(holes),
+        get_bumpiness(peaks),
+        np.count_nonzero(np.count_nonzero(area, axis=0) == 0),
+        np.max(wells),
+        np.count_nonzero(np.array(holes) > 0),
+        get_row_transition(area, highest_peak),
+        get_col_transition(area, peaks),
+        np.count_nonzero(np.mean(area, axis=1)),
+    ], dtype=float)
+
+
+def get_features_batch(areas):
+    """
+    The nine Genetic_AI.valuate ratings for a stack of boards of shape
+    (n, rows, cols), computed together. Returns an (n, 9) float array in
+    genetic.RATINGS order.
+    """
+    n, num_rows, num_cols = areas.shape
+    filled_cols = areas.any(axis=1)
+    peaks = np.where(filled_cols, num_rows - np.argmax(areas, axis=1), 0).astype(float)
+    highest_peak = peaks.max(axis=1)
+
+    rows = np.arange(num_rows)
+    below_peak = rows[None, :, None] >= (num_rows - peaks)[:, None, :]
+    holes = np.count_nonzero((areas == 0) & below_peak, axis=1)
+
+    wells = np.zeros_like(peaks)
+    wells[:, 1:] = np.maximum(peaks[:, :-1] - peaks[:, 1:], 0)
+    wells[:, :-1] = np.maximum(wells[:, :-1], peaks[:, 1:] - peaks[:, :-1])
+
+    row_diffs = np.count_nonzero(areas[:, :, 1:] != areas[:, :, :-1], axis=2)
+    row_transitions = np.sum(row_diffs * (rows[None, :] >= (num_rows - highest_peak)[:, None]), axis=1)
+    col_transitions = np.count_nonzero(
+        (areas[:, 1:] != areas[:, :-1]) & below_peak[:, :-1] & (peaks > 1)[:, None, :], axis=(1, 2)
+    )
+
+    features = np.empty((n, 9))
+    features[:, 0] = peaks.sum(axis=1)
+    features[:, 1] = holes.sum(axis=1)
+    features[:, 2] = np.abs(np.diff(peaks, axis=1)).sum(axis=1)
+    features[:, 3] = num_cols - filled_cols.sum(axis=1)
+    features[:, 4] = wells.max(axis=1)
+    features[:, 5] = np.count_nonzero(holes, axis=1)
+    features[:, 6] = row_transitions
+    features[:, 7] = col_transitions
+    features[:, 8] = np.count_nonzero(areas.any(axis=2), axis=1)
+    return features
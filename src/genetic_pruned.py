@@ -0,0 +1,194 @@
+import numpy as np
+from genetic import Genetic_AI
+from genetic_helpers import get_row_transition, get_col_transition
+from time import perf_counter
+import instrumentation
+
+"""
+Branch-and-bound move selection for Genetic_AI's linear valuation.
+
+Most of the nine ratings of a placement only depend on the column peaks,
+column fill counts and non-empty rows, which are updated from the current
+board in a few operations per candidate. Only the row and column transitions
+need the whole board. Every candidate gets its cheap ratings exactly and an
+interval for each transition count (the board's transitions in the candidate's
+range, plus or minus 2 per piece cell that can flip them); with the genotype's
+signs this gives the best score the candidate could reach. Candidates are
+visited from the best bound down and the transitions are computed in cost
+order, dropping a candidate as soon as its bound falls below the best score
+found. Scores are computed like Genetic_AI.valuate and ties go to the first
+candidate in Genetic_AI.get_best_move's order, so the chosen move is the same.
+"""
+
+# Indices of the ratings in genetic.RATINGS order
+AGG_HEIGHT, N_HOLES, BUMPINESS, NUM_PITS, MAX_WELLS, N_COLS_WITH_HOLES, ROW_TRANSITIONS, COL_TRANSITIONS, CLEARED = range(9)
+CHEAP = [AGG_HEIGHT, N_HOLES, BUMPINESS, NUM_PITS, MAX_WELLS, N_COLS_WITH_HOLES, CLEARED]
+# Costliest last: row transitions look at rows, column transitions at every column below its peak
+EXPENSIVE = [ROW_TRANSITIONS, COL_TRANSITIONS]
+
+# Bounds are sums of small integers times the genotype; this only absorbs rounding
+EPSILON = 1e-9
+
+
+class Pruned_Genetic_AI(Genetic_AI):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prune_stats = {
+            "decisions": 0,
+            "candidates": 0,
+            "evaluated": 0,  # candidates whose every rating was computed
+            "pruned": 0,  # candidates dropped before all ratings were computed
+            "expensive_ratings": 0,  # transition counts actually computed
+        }
+
+    def prune_summary(self):
+        s = self.prune_stats
+        exhaustive = len(EXPENSIVE) * s["candidates"]
+        skipped = 1 - s["expensive_ratings"] / exhaustive if exhaustive else 0.0
+        return (
+            f"decisions: {s['decisions']}  candidates: {s['candidates']}  evaluated: {s['evaluated']}  "
+            f"pruned: {s['pruned']}  transition ratings skipped: {skipped:.1%}"
+        )
+
+    def get_best_move(self, board, piece):
+        """
+        Same move as Genetic_AI.get_best_move, without computing the transition
+        ratings of candidates that cannot beat the best one found so far.
+        """
+        stats = instrumentation.active
+        if stats:
+            t = perf_counter()
+        gene = self.genotype
+        area = np.asarray(board.board, dtype=int)
+        num_rows, num_cols = area.shape
+
+        # Per column: index of the first filled row (num_rows if none) and number of filled cells
+        filled = area != 0
+        col_top = np.where(filled.any(axis=0), np.argmax(filled, axis=0), num_rows)
+        col_count = filled.sum(axis=0)
+        row_filled = filled.any(axis=1)
+        # Suffix sums of horizontal transitions per row and vertical transitions per column
+        row_diff = np.count_nonzero(area[:, 1:] != area[:, :-1], axis=1)
+        row_suffix = np.concatenate([np.cumsum(row_diff[::-1])[::-1], [0]])
+        col_diff = (area[1:] != area[:-1]).astype(int)
+        col_suffix = np.zeros((num_rows + 1, num_cols), dtype=int)
+        col_suffix[: num_rows - 1] = np.cumsum(col_diff[::-1], axis=0)[::-1]
+        base_col_transitions = np.where(num_rows - col_top > 1, col_suffix[np.minimum(col_top, num_rows), np.arange(num_cols)], 0)
+        if stats:
+            t = stats.lap("to_numpy", t)
+
+        placements = []
+        for i in range(4):
+            piece = piece.get_next_rotation()
+            for x in range(board.width):
+                try:
+                    y = board.drop_height(piece, x)
+                except:
+                    continue
+                placements.append((piece, x, y))
+        if not placements:
+            return -1000, None
+        upper, ratings, lows, highs, peaks = self.bounds(
+            placements, num_rows, col_top, col_count, row_filled, row_suffix, col_suffix, base_col_transitions
+        )
+        if stats:
+            t = stats.lap("bounds", t)
+
+        # Genetic_AI.get_best_move starts from -1000 and only takes strictly better moves
+        best_value, best_index = -1000, -1
+        pruned = expensive = evaluated = copies = 0
+        order = np.lexsort((np.arange(len(placements)), -upper))
+        for n, index in enumerate(order):
+            bound = upper[index]
+            if bound + EPSILON < best_value:
+                # Sorted by bound: nothing after this one can do better either
+                pruned += len(order) - n
+                break
+            piece, x, y = placements[index]
+            np_board = area.copy()
+            copies += 1
+            for pos in piece.body:
+                np_board[y + pos[1], x + pos[0]] = 1
+            dropped = False
+            for feature in EXPENSIVE:
+                if feature == ROW_TRANSITIONS:
+                    ratings[index, feature] = get_row_transition(np_board, np.max(peaks[index]))
+                else:
+                    ratings[index, feature] = get_col_transition(np_board, peaks[index])
+                expensive += 1
+                g = gene[feature]
+                bound += g * ratings[index, feature] - max(g * lows[index, feature], g * highs[index, feature])
+                if bound + EPSILON < best_value:
+                    dropped = True
+                    break
+            if dropped:
+                pruned += 1
+                continue
+            evaluated += 1
+            value = np.dot(ratings[index], gene)
+            if value > best_value or (value == best_value and best_index >= 0 and index < best_index):
+                best_value, best_index = value, index
+        best_x, best_piece = (-1000, None) if best_index < 0 else placements[best_index][1::-1]
+
+        s = self.prune_stats
+        s["decisions"] += 1
+        s["candidates"] += len(placements)
+        s["evaluated"] += evaluated
+        s["pruned"] += pruned
+        s["expensive_ratings"] += expensive
+        if stats:
+            stats.lap("features", t)
+            stats.count("placements", len(placements))
+            stats.count("board_copies", copies)
+            stats.count("pruned", pruned)
+        return best_x, best_piece
+
+    def bounds(self, placements, num_rows, col_top, col_count, row_filled, row_suffix, col_suffix, base_col_transitions):
+        """
+        Upper bound of the score of every placement, with its exact cheap
+        ratings, the (lows, highs) intervals of the transition ratings and its
+        column peaks, all computed together for the (n, cells) piece cells.
+        """
+        n, num_cols = len(placements), len(col_top)
+        cell_rows = np.array([[y + pos[1] for pos in piece.body] for piece, x, y in placements])
+        cell_cols = np.array([[x + pos[0] for pos in piece.body] for piece, x, y in placements])
+        k = np.repeat(np.arange(n), cell_rows.shape[1])
+        r, c = cell_rows.ravel(), cell_cols.ravel()
+
+        top = np.tile(col_top, (n, 1))
+        np.minimum.at(top, (k, c), r)
+        flips = np.zeros((n, num_cols), dtype=int)
+        np.add.at(flips, (k, c), 1)
+        count = col_count + flips
+        rows = np.tile(row_filled, (n, 1))
+        rows[k, r] = True
+        peaks = (num_rows - top).astype(float)
+        holes = peaks - count
+
+        wells = np.zeros_like(peaks)
+        wells[:, 1:] = np.maximum(peaks[:, :-1] - peaks[:, 1:], 0)
+        wells[:, :-1] = np.maximum(wells[:, :-1], peaks[:, 1:] - peaks[:, :-1])
+
+        ratings = np.zeros((n, 9))
+        ratings[:, AGG_HEIGHT] = peaks.sum(axis=1)
+        ratings[:, N_HOLES] = holes.sum(axis=1)
+        ratings[:, BUMPINESS] = np.abs(np.diff(peaks, axis=1)).sum(axis=1)
+        ratings[:, NUM_PITS] = np.count_nonzero(count == 0, axis=1)
+        ratings[:, MAX_WELLS] = wells.max(axis=1)
+        ratings[:, N_COLS_WITH_HOLES] = np.count_nonzero(holes > 0, axis=1)
+        ratings[:, CLEARED] = np.count_nonzero(rows, axis=1)
+
+        # Setting one cell changes its row's and its column's transitions by at most 2
+        lows, highs = np.zeros((n, 9)), np.zeros((n, 9))
+        row_base = row_suffix[top.min(axis=1)]
+        lows[:, ROW_TRANSITIONS] = np.maximum(row_base - 2 * cell_rows.shape[1], 0)
+        highs[:, ROW_TRANSITIONS] = row_base + 2 * cell_rows.shape[1]
+        touched = flips > 0
+        base = np.where(peaks > 1, col_suffix[top, np.arange(num_cols)], 0)
+        lows[:, COL_TRANSITIONS] = np.where(touched, np.maximum(base - 2 * flips, 0), base_col_transitions).sum(axis=1)
+        highs[:, COL_TRANSITIONS] = np.where(touched, base + 2 * flips, base_col_transitions).sum(axis=1)
+
+        gene = self.genotype
+        upper = ratings[:, CHEAP] @ gene[CHEAP]
+        upper += np.maximum(lows[:, EXPENSIVE] * gene[EXPENSIVE], highs[:, EXPENSIVE] * gene[EXPENSIVE]).sum(axis=1)
+        return upper, ratings, lows, highs, peaks
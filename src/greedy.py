@@ -4,6 +4,8 @@ from genetic_helpers import *
 from piece import BODIES, Piece
 from board import Board
 from random import randint
+from time import perf_counter
+import instrumentation
 
 """
 Performs a heuristic search of depth = 1
@@ -17,19 +19,36 @@ B = 0.5
 
 
 class Greedy_AI:
+    def __init__(self, weights=(0.5, 0.35, 0.18, -0.76)):
+        # Weights of aggregate height, holes, bumpiness and cleared rows
+        self.weights = weights
+
     def get_best_move(self, board, piece, depth=1):
         best_x = -1
         best_piece = None
         min_cost = 100000000
+        stats = instrumentation.active
+        if stats:
+            t = perf_counter()
         # moves = []
         for i in range(4):
             piece = piece.get_next_rotation()
+            if stats:
+                t = stats.lap("rotation", t)
             for x in range(board.width):
                 try:
                     y = board.drop_height(piece, x)
                 except:
                     continue
+                finally:
+                    if stats:
+                        t = stats.lap("drop_height", t)
                 c = self.cost(board.board, x, y, piece)
+                if stats:
+                    t = stats.lap("cost", t)
+                    stats.count("placements")
+                    # cost() copies only the rows the piece lands in
+                    stats.count("row_copies", len({pos[1] for pos in piece.body}))
                 if c < min_cost:
                     min_cost = c
                     best_x = x
@@ -51,11 +70,12 @@ class Greedy_AI:
                 except:
                     continue
                 costs = []
-                moved_board = Board()
-                moved_board.board = deepcopy(board.board)
-                moved_board.widths = deepcopy(board.widths)
-                moved_board.heights = deepcopy(board.heights)
-                moved_board.place(x, y, piece)
+                # Place in the real board and revert afterwards instead of copying it
+                try:
+                    move = board.apply(x, y, piece, clear=False)
+                except Exception:
+                    move = None
+                moved_board = board
                 # for next_body_idx in range(len(BODIES2)):
                 #     new_piece = Piece(body=BODIES2[next_body_idx][0])
                 #     for j in range(4):
@@ -69,7 +89,7 @@ class Greedy_AI:
                 #             costs.append(c)
                 for j in range(5):
                     new_piece = Piece(body=BODIES[randint(0, 9)][0])
-                    x2 = randint(0, 9)
+                    x2 = randint(0, board.width - 1)
                     try:
                         y2 = moved_board.drop_height(new_piece, x2)
                     except:
@@ -77,6 +97,9 @@ class Greedy_AI:
                     c = self.cost(moved_board.board, x2, y2, new_piece)
                     costs.append(c)
 
+                if move is not None:
+                    board.undo(move)
+
                 cost = np.mean(costs)
                 if cost < min_cost:
                     min_cost = cost
@@ -91,112 +114,49 @@ class Greedy_AI:
         COST = #holes + max height
         """
 
-        board_copy = deepcopy(board)
-
+        # Only the rows touched by the piece need their own copy
+        board_copy = list(board)
         for pos in piece.body:
-            board_copy[y + pos[1]][x + pos[0]] = True
+            row = y + pos[1]
+            if board_copy[row] is board[row]:
+                board_copy[row] = list(board[row])
+            board_copy[row][x + pos[0]] = True
 
-        holes = 0
-        max_height = 0
-        num_cleared = 0
-        cum_wells = 0
-        for i in range(len(board_copy)):
-            if all(board_copy[i]):
-                num_cleared += 1
-            for j in range(len(board_copy[0])):
-
-                if board_copy[i][j]:
-                    max_height = max(max_height, i)
-                    # filled, can't be a hole
-                    continue
-                has = False
-                for k in range(i + 1, len(board_copy)):
-                    if board_copy[k][j]:
-                        has = True
-                        break
-                if has:
-                    # has a block above
-                    holes += 1
-                # if not has:
-                #     left_blocked = j == 0 or board_copy[i][j - 1]
-                #     right_blocked = j == 9 or board_copy[i][j + 1]
-                #     if left_blocked and right_blocked:
-                #         cum_wells += 1
-        agg_height = 0
-        for col in range(len(board_copy[i])):
-            agg = 0
-            for row in range(len(board_copy)):
-                if board_copy[row][col]:
-                    agg = row
-            agg_height += agg
-        heights = []
-        for col in range(len(board_copy[i])):
-            mh = 0
-            for row in range(len(board_copy)):
-                if board_copy[row][col]:
-                    mh = row
-            heights.append(mh)
-        bumpiness = 0
-        for i in range(len(heights) - 1):
-            bumpiness += abs(heights[i] - heights[i + 1])
-
-        c = 0.5 * agg_height + 0.35 * holes + 0.18 * bumpiness - 0.76 * num_cleared
-        # c = agg_height + holes + bumpiness - num_cleared
-        return c
+        return self.board_cost(board_copy)
 
     def cost0(self, board):
         """
         COST = #holes + max height
         """
-        # board_copy = deepcopy(board.board)
-        board_copy = board.board
-
-        # for pos in piece.body:
-        #     board_copy[y + pos[1]][x + pos[0]] = True
+        return self.board_cost(board.board)
 
-        holes = 0
-        max_height = 0
+    def board_cost(self, board_copy):
+        """
+        Weighted cost of a grid of any size, scanning each column once
+        (heights are row indices of the topmost filled cell, as before)
+        """
         num_cleared = 0
-        cum_wells = 0
-        for i in range(len(board_copy)):
-            if all(board_copy[i]):
+        for row in board_copy:
+            if all(row):
                 num_cleared += 1
-            for j in range(len(board_copy[0])):
 
-                if board_copy[i][j]:
-                    max_height = max(max_height, i)
-                    # filled, can't be a hole
-                    continue
-                has = False
-                for k in range(i + 1, len(board_copy)):
-                    if board_copy[k][j]:
-                        has = True
-                        break
-                if has:
-                    # has a block above
-                    holes += 1
-                # if not has:
-                #     left_blocked = j == 0 or board_copy[i][j - 1]
-                #     right_blocked = j == 9 or board_copy[i][j + 1]
-                #     if left_blocked and right_blocked:
-                #         cum_wells += 1
-        agg_height = 0
-        for col in range(len(board_copy[i])):
-            agg = 0
-            for row in range(len(board_copy)):
-                if board_copy[row][col]:
-                    agg = row
-            agg_height += agg
+        holes = 0
         heights = []
-        for col in range(len(board_copy[i])):
-            mh = 0
-            for row in range(len(board_copy)):
+        for col in range(len(board_copy[0])):
+            top = 0
+            for row in range(len(board_copy) - 1, -1, -1):
                 if board_copy[row][col]:
-                    mh = row
-            heights.append(mh)
+                    top = row
+                    break
+            heights.append(top)
+            for row in range(top):
+                if not board_copy[row][col]:
+                    # has a block above
+                    holes += 1
+        agg_height = sum(heights)
         bumpiness = 0
         for i in range(len(heights) - 1):
             bumpiness += abs(heights[i] - heights[i + 1])
 
-        c = 0.5 * agg_height + 0.35 * holes + 0.18 * bumpiness - 0.76 * num_cleared
-        return c
+        a, b, c, d = self.weights
+        return a * agg_height + b * holes + c * bumpiness + d * num_cleared
@@ -0,0 +1,119 @@
+"""
+Opt-in timing and counters for the agents' hot paths.
+
+Nothing is recorded unless enable() was called: instrumented code reads
+`instrumentation.active` once per decision and only times when it is set.
+
+    stats = instrumentation.enable()
+    Game("greedy").run_no_visual()
+    print(stats.summary())
+"""
+
+import json
+import math
+from time import perf_counter
+
+# log2 microsecond buckets for decision latency: bucket i holds [2**i, 2**(i+1)) us
+NUM_BUCKETS = 32
+
+active = None
+
+
+class Stats:
+    def __init__(self):
+        self.histogram = [0] * NUM_BUCKETS
+        self.decisions = 0
+        self.decision_time = 0.0
+        self.max_decision = 0.0
+        self.phases = {}
+        self.counters = {}
+
+    def decision(self, seconds):
+        us = seconds * 1e6
+        bucket = min(max(int(math.log2(us)) if us >= 1 else 0, 0), NUM_BUCKETS - 1)
+        self.histogram[bucket] += 1
+        self.decisions += 1
+        self.decision_time += seconds
+        self.max_decision = max(self.max_decision, seconds)
+
+    def lap(self, phase, start):
+        """Add the time since `start` to a phase and return the current time."""
+        now = perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - start
+        return now
+
+    def count(self, counter, n=1):
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def merge(self, other):
+        """Add the numbers of another Stats (or its to_dict()) into this one."""
+        if isinstance(other, Stats):
+            other = other.to_dict()
+        self.histogram = [a + b for a, b in zip(self.histogram, other["histogram"])]
+        self.decisions += other["decisions"]
+        self.decision_time += other["decision_time"]
+        self.max_decision = max(self.max_decision, other["max_decision"])
+        for name, seconds in other["phases"].items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+        for name, n in other["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def percentile(self, q):
+        """Upper edge, in seconds, of the histogram bucket holding the q-th percentile."""
+        target = q / 100 * self.decisions
+        seen = 0
+        for bucket, n in enumerate(self.histogram):
+            seen += n
+            if n and seen >= target:
+                return 2 ** (bucket + 1) / 1e6
+        return 0.0
+
+    def to_dict(self):
+        return {
+            "histogram": self.histogram,
+            "decisions": self.decisions,
+            "decision_time": self.decision_time,
+            "max_decision": self.max_decision,
+            "phases": self.phases,
+            "counters": self.counters,
+        }
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        lines = []
+        if self.decisions:
+            mean = self.decision_time / self.decisions
+            lines.append(f"decisions: {self.decisions}")
+            lines.append(
+                f"latency ms: mean {mean * 1e3:.3f}  p50 <{self.percentile(50) * 1e3:.3f}  "
+                f"p90 <{self.percentile(90) * 1e3:.3f}  p99 <{self.percentile(99) * 1e3:.3f}  "
+                f"max {self.max_decision * 1e3:.3f}"
+            )
+        if self.phases:
+            total = sum(self.phases.values())
+            lines.append(f"{'phase':<14} {'seconds':>10} {'share':>7}")
+            for name, seconds in sorted(self.phases.items(), key=lambda item: -item[1]):
+                lines.append(f"{name:<14} {seconds:>10.3f} {seconds / total:>7.1%}")
+        if self.counters:
+            lines.append(f"{'counter':<14} {'total':>10} {'/decision':>10}")
+            for name, n in sorted(self.counters.items()):
+                per = n / self.decisions if self.decisions else 0
+                lines.append(f"{name:<14} {n:>10} {per:>10.1f}")
+        return "\n".join(lines)
+
+
+def enable():
+    """Start recording into a fresh Stats and return it."""
+    global active
+    active = Stats()
+    return active
+
+
+def disable():
+    """Stop recording and return what was recorded."""
+    global active
+    stats, active = active, None
+    return stats
@@ -0,0 +1,117 @@
+import random
+import numpy as np
+from board import Board
+from genetic_helpers import bool_to_np, get_features_batch
+from piece import BODIES, ROTATIONS
+
+"""
+Plays a whole population of genetic agents in lockstep.
+
+Every agent plays the same seeded piece sequences. At each step the candidate
+after-states of every live game are featurized as one batch and scored against
+the (pop_size, 9) genotype matrix, then each game makes its best move; games
+drop out as they top out. Moves are the ones Genetic_AI.get_best_move would
+choose, so each game matches Game('genetic', agent, seed=seed).run_no_visual()
+with either aggregate.
+"""
+
+
+def piece_sequence(seed):
+    """Yield BODIES indices in the order Game(seed=seed) deals pieces."""
+    rng = random.Random(seed)
+    indices = range(len(BODIES))
+    while True:
+        yield rng.choice(indices)
+
+
+def score(features, genotypes, aggregate):
+    if aggregate == "lin":
+        return np.einsum("ij,ij->i", features, genotypes)
+    elif aggregate == "exp":
+        return np.einsum("ij,ij->i", features ** genotypes, genotypes)
+    raise ValueError(f"Unsupported aggregate '{aggregate}'")
+
+
+def play_population(genotypes, seeds, aggregate="lin", width=10, height=20, monitor=None):
+    """
+    Play every genotype (rows of a (pop_size, 9) matrix) on every seed.
+    Returns (pieces_dropped, rows_cleared), each of shape (pop_size, len(seeds)).
+    With `monitor` ('host:port'), game agent * len(seeds) + trial publishes
+    board snapshots there for monitor.py.
+    """
+    genotypes = np.asarray(genotypes, dtype=float)
+    pop_size, num_trials = len(genotypes), len(seeds)
+    games = [(agent, trial) for agent in range(pop_size) for trial in range(num_trials)]
+    boards = [Board(width, height) for _ in games]
+    pieces_dropped = np.zeros((pop_size, num_trials), dtype=int)
+    rows_cleared = np.zeros((pop_size, num_trials), dtype=int)
+
+    # All games of a trial see the same pieces; extend each sequence on demand
+    generators = [piece_sequence(seed) for seed in seeds]
+    sequences = [[] for _ in seeds]
+    live = list(range(len(games)))
+    publishers = None
+    if monitor is not None:
+        from monitor import SnapshotPublisher, with_run_id
+
+        monitor = with_run_id(monitor)
+        publishers = [SnapshotPublisher(monitor, g) for g in range(len(games))]
+    step = 0
+    while live:
+        for trial in range(num_trials):
+            sequences[trial].append(next(generators[trial]))
+
+        # Candidate placements of every live game, in Genetic_AI.get_best_move order
+        owners, cand_games, cand_rows, cand_cols, moves = [], [], [], [], []
+        for g in live:
+            agent, trial = games[g]
+            board = boards[g]
+            for piece in ROTATIONS[sequences[trial][step]]:
+                for x in range(width - len(piece.skirt) + 1):
+                    y = board.drop_height(piece, x)
+                    owners.append(agent)
+                    cand_games.append(g)
+                    cand_rows.append([y + pos[1] for pos in piece.body])
+                    cand_cols.append([x + pos[0] for pos in piece.body])
+                    moves.append((x, y, piece))
+
+        bases = {g: bool_to_np(boards[g].board) for g in live}
+        index = {g: i for i, g in enumerate(live)}
+        areas = np.stack([bases[g] for g in live])[[index[g] for g in cand_games]]
+        rows = np.array(cand_rows)
+        cols = np.array(cand_cols)
+        candidates = np.arange(len(moves))[:, None]
+        # Pieces sticking out of the top are skipped, as get_best_move's except would
+        fits = (rows < areas.shape[1]).all(axis=1)
+        areas[candidates[fits], rows[fits], cols[fits]] = 1
+
+        values = score(get_features_batch(areas), genotypes[owners], aggregate)
+        # Pieces sticking out and NaN scores (0 ** negative weights under 'exp')
+        # never win get_best_move's '>' comparison
+        values[~fits | np.isnan(values)] = -np.inf
+
+        # First best candidate of each game, like the strict '>' in get_best_move
+        cand_games = np.array(cand_games)
+        still_live = []
+        for g in live:
+            mask = np.flatnonzero(cand_games == g)
+            best = mask[np.argmax(values[mask])]
+            agent, trial = games[g]
+            board = boards[g]
+            cleared = 0
+            if values[best] > -1000:
+                x, y, piece = moves[best]
+                board.place(x, y, piece)
+                cleared = board.clear_rows()
+                rows_cleared[agent, trial] += cleared
+            pieces_dropped[agent, trial] += 1
+            if publishers is not None:
+                publishers[g].record(board)
+                publishers[g].set_last_reward(cleared)
+            if not board.top_filled():
+                still_live.append(g)
+            elif publishers is not None:
+                publishers[g].publish(board, done=True)
+        live = still_live
+        step += 1
+    return pieces_dropped, rows_cleared
@@ -4,14 +4,24 @@ import os
 
 
 def main():
-    # textfile = open("./src/data/expectiminimax/10.csv", "w")
-    # textfile.write("dropped, rows\n")
-    # for i in range(2):
-    #     print(i)
-    #     g = Game(sys.argv[1])
-    #     dropped, rows = g.run_no_visual()
-    #     textfile.write(str(dropped) + ", " + str(rows) + "\n")
-    # textfile.close()
+    if sys.argv[1] == "bench":
+        # Headless batch mode, see bench.py
+        from bench import main as bench_main
+
+        bench_main(sys.argv[2:])
+        return
+    if sys.argv[1] == "monitor":
+        # Grid view of many headless games, see monitor.py
+        from monitor import main as monitor_main
+
+        monitor_main(sys.argv[2:])
+        return
+    if sys.argv[1] == "tournament":
+        # Paired-seed agent comparison, see tournament.py
+        from tournament import main as tournament_main
+
+        tournament_main(sys.argv[2:])
+        return
     g = Game(sys.argv[1])
     # g.run_no_visual()
     g.run()
@@ -4,6 +4,7 @@ from board import Board
 from copy import deepcopy
 from piece import Piece
 from greedy import Greedy_AI
+import instrumentation
 
 """
 Performs MCTS to return the best move
@@ -23,6 +24,13 @@ class MCTS_AI:
 
 
 class State:
+    """
+    A search state. All states of one search share the same Board: a state is
+    only valid while the moves leading to it are applied (see Board.apply/undo).
+    """
+
+    __slots__ = ("board", "piece", "depth", "cleared")
+
     def __init__(self, board, piece, depth, cleared=0):
         self.board = board
         self.piece = piece
@@ -44,17 +52,13 @@ class State:
         return actions
 
     def move(self, action):
-        board_copy = Board()
-        arr = deepcopy(self.board.board)
-        widths = deepcopy(self.board.widths)
-        heights = deepcopy(self.board.heights)
-        board_copy.board = arr
-        board_copy.widths = widths
-        board_copy.heights = heights
+        """Apply the action to the shared board, returning the next state and the journal to undo it."""
         p, x, y = action
-        board_copy.place(x, y, p)
-        cleared = board_copy.clear_rows()
-        return State(board_copy, Piece(), self.depth + 1, self.cleared + cleared)
+        journal = self.board.apply(x, y, p)
+        if instrumentation.active:
+            instrumentation.active.count("placements")
+        cleared = len(journal[3])
+        return State(self.board, Piece(), self.depth + 1, self.cleared + cleared), journal
 
     def is_game_over(self):
         return False
@@ -64,6 +68,17 @@ class State:
 
 
 class MonteCarloTreeSearchNode:
+    __slots__ = (
+        "state",
+        "simulations",
+        "parent",
+        "parent_action",
+        "children",
+        "_number_of_visits",
+        "_score",
+        "_untried_actions",
+    )
+
     def __init__(self, state, parent=None, parent_action=None):
         self.state = state
         self.simulations = 1
@@ -71,9 +86,6 @@ class MonteCarloTreeSearchNode:
         self.parent_action = parent_action
         self.children = []
         self._number_of_visits = 0
-        self._results = defaultdict(int)
-        self._results[1] = 0
-        self._results[-1] = 0
         self._score = 0
         self._untried_actions = self.untried_actions()
 
@@ -92,13 +104,13 @@ class MonteCarloTreeSearchNode:
 
     def expand(self):
         action = self._untried_actions.pop()
-        next_state = self.state.move(action)
+        next_state, journal = self.state.move(action)
         child_node = MonteCarloTreeSearchNode(
             next_state, parent=self, parent_action=action
         )
 
         self.children.append(child_node)
-        return child_node
+        return child_node, journal
 
     def is_terminal_node(self):
         return self.state.is_game_over()
@@ -140,21 +152,32 @@ class MonteCarloTreeSearchNode:
         # return greed.get_best_move(self.state.board, self.state.piece)
 
     def _tree_policy(self):
-
+        """
+        Descend to a leaf, applying each move on the way to the shared board.
+        Returns the leaf and the journals to undo, in the order they were applied.
+        """
+        journals = []
         current_node = self
         while not current_node.is_terminal_node():
 
             if not current_node.is_fully_expanded():
-                return current_node.expand()
+                child_node, journal = current_node.expand()
+                journals.append(journal)
+                return child_node, journals
             else:
                 current_node = current_node.best_child()
-        return current_node
+                p, x, y = current_node.parent_action
+                journals.append(current_node.state.board.apply(x, y, p))
+        return current_node, journals
 
     def best_action(self):
+        board = self.state.board
         for i in range(self.simulations):
 
-            v = self._tree_policy()
+            v, journals = self._tree_policy()
             reward = v.rollout()
             v.backpropagate(reward)
+            for journal in reversed(journals):
+                board.undo(journal)
 
         return self.best_child(c_param=0.0)
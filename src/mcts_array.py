@@ -0,0 +1,228 @@
+import numpy as np
+from random import randrange
+from piece import BODIES, ROTATIONS, rotations
+import instrumentation
+
+"""
+MCTS over a preallocated, array-backed tree.
+
+Node statistics are kept as struct-of-arrays (visits, value sums, parent,
+first child, ...) and every node's board is stored as a packed bitboard, one
+integer per row with bit `col` set for a filled cell, in a preallocated pool.
+A search therefore holds a fixed number of nodes in bounded memory, and
+children of a node are allocated contiguously when it is expanded.
+"""
+
+
+def pack_board(board):
+    """Convert a Board into a list of row bitmasks."""
+    return [sum(1 << col for col in range(board.width) if row[col]) for row in board.board]
+
+
+def column_heights(rows, width):
+    """Height of each column (index of the topmost filled row + 1)."""
+    heights = [0] * width
+    seen = 0
+    full = (1 << width) - 1
+    for r in range(len(rows) - 1, -1, -1):
+        new = rows[r] & ~seen
+        if new:
+            for col in range(width):
+                if new >> col & 1:
+                    heights[col] = r + 1
+            seen |= new
+            if seen == full:
+                break
+    return heights
+
+
+def place(rows, heights, piece, x, width):
+    """
+    Drop a piece at column x on packed rows. Returns the new rows and the number
+    of cleared rows, or None if the piece does not fit on the board.
+    """
+    y = -1
+    for i in range(len(piece.skirt)):
+        y = max(heights[x + i] - piece.skirt[i], y)
+    rows = list(rows)
+    for pos in piece.body:
+        if y + pos[1] >= len(rows):
+            return None
+        rows[y + pos[1]] |= 1 << (x + pos[0])
+    # Same row deletion order as Board.clear_rows
+    full = (1 << width) - 1
+    to_delete = [i for i in range(len(rows)) if rows[i] == full]
+    for row in to_delete:
+        del rows[row]
+        rows.append(0)
+    return rows, len(to_delete)
+
+
+def cost(rows, width):
+    """Packed-row equivalent of Greedy_AI.board_cost."""
+    full = (1 << width) - 1
+    num_cleared = 0
+    holes = 0
+    heights = [0] * width
+    covered = 0
+    for r in range(len(rows) - 1, -1, -1):
+        row = rows[r]
+        if row == full:
+            num_cleared += 1
+        # empty cells with a block somewhere above
+        holes += bin(covered & ~row & full).count("1")
+        new = row & ~covered
+        if new:
+            for col in range(width):
+                if new >> col & 1:
+                    heights[col] = r
+        covered |= row
+    bumpiness = 0
+    for i in range(width - 1):
+        bumpiness += abs(heights[i] - heights[i + 1])
+    return 0.5 * sum(heights) + 0.35 * holes + 0.18 * bumpiness - 0.76 * num_cleared
+
+
+class MCTSTree:
+    """
+    Fixed-capacity tree. Node 0 is the root; a node's children occupy
+    first_child[n] .. first_child[n] + num_children[n] - 1.
+    """
+
+    def __init__(self, capacity, width=10, height=20):
+        self.capacity = capacity
+        self.width = width
+        self.num_rows = height + 4
+        if width <= 16:
+            row_dtype = np.uint16
+        elif width <= 32:
+            row_dtype = np.uint32
+        else:
+            row_dtype = np.uint64
+        self.visits = np.zeros(capacity, dtype=np.float64)
+        self.value_sum = np.zeros(capacity, dtype=np.float64)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.num_children = np.zeros(capacity, dtype=np.int16)
+        self.rotation = np.zeros(capacity, dtype=np.int8)
+        self.x = np.zeros(capacity, dtype=np.int8)
+        self.piece = np.zeros(capacity, dtype=np.int8)  # BODIES index of the piece to place next
+        self.boards = np.zeros((capacity, self.num_rows), dtype=row_dtype)
+        self.size = 0
+
+    def nbytes(self):
+        arrays = [
+            self.visits,
+            self.value_sum,
+            self.parent,
+            self.first_child,
+            self.num_children,
+            self.rotation,
+            self.x,
+            self.piece,
+            self.boards,
+        ]
+        return sum(a.nbytes for a in arrays)
+
+    def reset(self, rows):
+        self.size = 1
+        self.visits[0] = 0
+        self.value_sum[0] = 0
+        self.parent[0] = -1
+        self.first_child[0] = -1
+        self.num_children[0] = 0
+        self.boards[0] = rows
+
+    def expand(self, node, pieces):
+        """
+        Allocate every legal placement of `pieces` (the four rotations of the
+        node's piece) as children. Returns False if the tree is full or there
+        is no legal placement.
+        """
+        rows = self.boards[node].tolist()
+        heights = column_heights(rows, self.width)
+        children = []
+        for rotation, piece in enumerate(pieces):
+            for x in range(self.width - len(piece.skirt) + 1):
+                placed = place(rows, heights, piece, x, self.width)
+                if placed is not None:
+                    children.append((rotation, x, placed[0]))
+        if instrumentation.active:
+            instrumentation.active.count("placements", len(children))
+        if not children or self.size + len(children) > self.capacity:
+            return False
+
+        start = self.size
+        end = start + len(children)
+        self.size = end
+        self.first_child[node] = start
+        self.num_children[node] = len(children)
+        self.visits[start:end] = 0
+        self.value_sum[start:end] = 0
+        self.parent[start:end] = node
+        self.first_child[start:end] = -1
+        self.num_children[start:end] = 0
+        for i, (rotation, x, child_rows) in enumerate(children):
+            self.rotation[start + i] = rotation
+            self.x[start + i] = x
+            self.piece[start + i] = randrange(len(BODIES))
+            self.boards[start + i] = child_rows
+        return True
+
+    def best_child(self, node, c_param=0.1):
+        start = self.first_child[node]
+        end = start + self.num_children[node]
+        visits = self.visits[start:end]
+        unvisited = np.flatnonzero(visits == 0)
+        if len(unvisited):
+            # Untried children first, last one first like MonteCarloTreeSearchNode.expand
+            return start + int(unvisited[-1])
+        weights = self.value_sum[start:end] / visits + c_param * np.sqrt(
+            2 * np.log(self.visits[node]) / visits
+        )
+        return start + int(np.argmax(weights))
+
+    def best_visited_child(self, node):
+        """Child with the highest mean value among those visited at least once."""
+        start = self.first_child[node]
+        end = start + self.num_children[node]
+        visits = self.visits[start:end]
+        means = np.full(len(visits), -np.inf)
+        np.divide(self.value_sum[start:end], visits, out=means, where=visits > 0)
+        return start + int(np.argmax(means))
+
+    def backpropagate(self, node, result):
+        while node != -1:
+            self.visits[node] += 1
+            self.value_sum[node] += result
+            node = self.parent[node]
+
+
+class Array_MCTS_AI:
+    def __init__(self, simulations=1, capacity=100000, width=10, height=20):
+        self.simulations = simulations
+        self.tree = MCTSTree(capacity, width, height)
+
+    def get_best_move(self, board, piece):
+        tree = self.tree
+        if tree.width != board.width or tree.num_rows != board.height + 4:
+            tree = self.tree = MCTSTree(tree.capacity, board.width, board.height)
+        tree.reset(pack_board(board))
+        root_pieces = rotations(piece)
+        if not tree.expand(0, root_pieces):
+            return -1, root_pieces[0]
+
+        for i in range(self.simulations):
+            node = 0
+            while tree.num_children[node] > 0:
+                node = tree.best_child(node)
+                if tree.visits[node] == 0:
+                    break
+            else:
+                if tree.expand(node, ROTATIONS[tree.piece[node]]):
+                    node = tree.best_child(node)
+            reward = -cost(tree.boards[node].tolist(), tree.width)
+            tree.backpropagate(node, reward)
+
+        best = tree.best_visited_child(0)
+        return int(tree.x[best]), root_pieces[tree.rotation[best]]
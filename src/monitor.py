@@ -0,0 +1,399 @@
+"""
+Watch many headless games at once: a grid of miniature boards with their
+pieces/rows counters in one window.
+
+    python src/main.py monitor --agent greedy --games 64 --workers 16
+    python src/main.py monitor --attach 5600      # games of a running bench or training run
+
+Games publish through a SnapshotPublisher, the game's recorder (or wrapped
+around one). At most `rate` times per second per game it sends the packed board
+and counters as one UDP datagram to the monitor's address, from a non-blocking
+socket; nothing waits for the monitor, and snapshots are simply lost when no
+monitor is listening or it falls behind, so a slow, closed or absent window
+never holds the workers up. Any run can opt in by publishing to an address:
+
+    python src/main.py bench --agent genetic --games 500 --monitor 5600
+    run_X_epochs(..., monitor="127.0.0.1:5600")
+
+and a monitor attached to that address shows the games as they are played,
+whether it was started before or after them. Each run tags its snapshots with
+a random run id (see with_run_id), so concurrent runs publishing to the same
+monitor get cells of their own even when their slot numbers coincide. The
+viewer keeps the latest snapshot per game and only redraws the cells whose
+snapshot changed since the last frame; new games take the cell of a finished
+one when the grid is full.
+
+    python src/monitor.py --overhead --agent greedy --games 32   # worker throughput with and without a monitor
+"""
+
+import argparse
+import math
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from multiprocessing import Pool
+from time import perf_counter
+
+import numpy as np
+
+BLACK = 0, 0, 0
+WHITE = 147, 151, 153
+GREEN = (0, 255, 0)
+RED = (200, 60, 60)
+
+DEFAULT_PORT = 5600
+SNAPSHOT = struct.Struct("<IIIIBHH")  # run, slot, pieces, rows, done, width, height; packed cells follow
+
+_socket = None  # One sending socket per process, see snapshot_socket
+
+
+def parse_address(address):
+    """'host:port', 'port' or a (host, port) tuple -> (host, port); the host defaults to 127.0.0.1."""
+    if address is None or isinstance(address, tuple):
+        return address
+    host, _, port = str(address).rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def with_run_id(address):
+    """
+    (host, port, run id) with a fresh random id for the games of one run; every
+    process of the run publishes with it. Addresses that carry one already, and
+    None, are returned unchanged.
+    """
+    address = parse_address(address)
+    if address is None or len(address) > 2:
+        return address
+    return address + (int.from_bytes(os.urandom(4), "little"),)
+
+
+def snapshot_socket():
+    global _socket
+    if _socket is None:
+        _socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        _socket.setblocking(False)
+    return _socket
+
+
+class SnapshotPublisher:
+    """
+    Game recorder that sends throttled board snapshots to a monitor's address.
+    Calls are forwarded to `recorder`, so it can be layered over another one.
+    """
+
+    def __init__(self, address, slot, rate=5.0, recorder=None):
+        address = parse_address(address)
+        self.address = address[:2]
+        self.run = address[2] if len(address) > 2 else 0
+        self.slot = slot
+        self.interval = 1.0 / rate
+        self.recorder = recorder
+        self.last = -math.inf
+        self.pieces = 0
+        self.rows = 0
+
+    def record(self, board, *args):
+        if self.recorder is not None:
+            self.recorder.record(board, *args)
+        self.pieces += 1
+        now = perf_counter()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.publish(board)
+
+    def set_last_reward(self, reward):
+        if self.recorder is not None:
+            self.recorder.set_last_reward(reward)
+        self.rows += reward
+
+    def publish(self, board, done=False):
+        cells = np.packbits(np.asarray(board.board[: board.height], dtype=bool)).tobytes()
+        header = SNAPSHOT.pack(self.run, self.slot, self.pieces, self.rows, done, board.width, board.height)
+        try:
+            snapshot_socket().sendto(header + cells, self.address)
+        except OSError:
+            # Full send buffer, nobody listening or a board too big for a datagram: the snapshot is dropped
+            pass
+
+
+class SnapshotListener:
+    """The monitor's end: a UDP socket bound to `address`, read without blocking."""
+
+    def __init__(self, address=DEFAULT_PORT):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind(parse_address(address))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+        self.received = 0
+
+    def poll(self):
+        """Snapshots ((run, slot), cells, pieces, rows, done, width, height) received since the last call."""
+        snapshots = []
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                return snapshots
+            if len(data) < SNAPSHOT.size:
+                continue
+            run, slot, pieces, rows, done, width, height = SNAPSHOT.unpack_from(data)
+            snapshots.append(((run, slot), data[SNAPSHOT.size :], pieces, rows, bool(done), width, height))
+            self.received += 1
+
+    def close(self):
+        self.sock.close()
+
+
+def play_watched(job):
+    """Play one headless game while publishing snapshots; runs inside a worker process."""
+    from game import Game
+    from genetic import Genetic_AI
+    from genetic_pruned import Pruned_Genetic_AI
+
+    slot, seed, agent, genotype, width, height, rate, address = job
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    ai = None
+    if agent == "genetic" and genotype is not None:
+        ai = Genetic_AI(genotype=np.array(genotype))
+    elif agent == "genetic_pruned" and genotype is not None:
+        ai = Pruned_Genetic_AI(genotype=np.array(genotype))
+    publisher = SnapshotPublisher(address, slot, rate) if address is not None else None
+    start = perf_counter()
+    game = Game(agent, agent=ai, seed=seed, width=width, height=height, recorder=publisher)
+    dropped, rows = game.run_no_visual(verbose=False)
+    if publisher is not None:
+        publisher.publish(game.board, done=True)
+    return slot, dropped, rows, perf_counter() - start
+
+
+def grid_shape(games, aspect=16 / 9):
+    cols = max(1, math.ceil(math.sqrt(games * aspect / 2)))
+    return cols, math.ceil(games / cols)
+
+
+class MonitorView:
+    """Grid of miniature boards, one cell per game."""
+
+    def __init__(self, games, width=10, height=20, cell=6, label_height=14):
+        import pygame
+
+        self.pygame = pygame
+        self.games = games
+        self.width, self.height = width, height
+        self.cell = cell
+        self.label_height = label_height
+        self.cols, self.rows = grid_shape(games)
+        self.slot_size = (width * cell + 4, height * cell + label_height + 4)
+        pygame.init()
+        self.screen = pygame.display.set_mode((self.cols * self.slot_size[0], self.rows * self.slot_size[1]))
+        pygame.display.set_caption(f"{games} games")
+        self.font = pygame.font.SysFont(None, label_height + 2)
+        self.cells = {}  # (run, slot) of a game -> grid cell
+        self.latest = {}  # grid cell -> newest snapshot
+        self.drawn = {}  # grid cell -> snapshot currently on screen
+        self.screen.fill(BLACK)
+        pygame.display.flip()
+
+    def update(self, snapshot):
+        game, cells, pieces, rows, done, width, height = snapshot
+        if (width, height) != (self.width, self.height):
+            return
+        if game not in self.cells:
+            if len(self.cells) < self.games:
+                self.cells[game] = len(self.cells)
+            else:
+                # Take over the cell of a finished game, if there is one
+                finished = next((g for g, c in self.cells.items() if c in self.latest and self.latest[c][3]), None)
+                if finished is None:
+                    return
+                self.cells[game] = self.cells.pop(finished)
+        self.latest[self.cells[game]] = (cells, pieces, rows, done)
+
+    def cell_rect(self, index):
+        w, h = self.slot_size
+        return self.pygame.Rect((index % self.cols) * w, (index // self.cols) * h, w, h)
+
+    def draw_cell(self, index, snapshot):
+        pygame = self.pygame
+        cells, pieces, rows, done = snapshot
+        rect = self.cell_rect(index)
+        pygame.draw.rect(self.screen, BLACK, rect)
+        board = np.unpackbits(np.frombuffer(cells, dtype=np.uint8), count=self.width * self.height)
+        board = board.reshape(self.height, self.width)
+        left, top = rect.left + 2, rect.top + 2
+        color = RED if done else GREEN
+        for row, col in zip(*np.nonzero(board)):
+            # Row 0 is the bottom of the board, as in Game.draw_pieces
+            y = top + (self.height - row - 1) * self.cell
+            pygame.draw.rect(self.screen, color, pygame.Rect(left + col * self.cell, y, self.cell - 1, self.cell - 1))
+        pygame.draw.rect(
+            self.screen, WHITE, pygame.Rect(left - 1, top - 1, self.width * self.cell + 2, self.height * self.cell + 2), 1
+        )
+        label = self.font.render(f"{pieces}p {rows}r", True, WHITE)
+        self.screen.blit(label, (left, top + self.height * self.cell + 1))
+        return rect
+
+    def render(self):
+        """Redraw the cells whose snapshot changed; returns how many were drawn."""
+        dirty = [self.draw_cell(i, s) for i, s in self.latest.items() if self.drawn.get(i) != s]
+        self.drawn.update(self.latest)
+        if dirty:
+            self.pygame.display.update(dirty)
+        return len(dirty)
+
+    def closed(self):
+        return any(event.type == self.pygame.QUIT for event in self.pygame.event.get())
+
+    def close(self):
+        self.pygame.quit()
+
+
+def watch(listener, view, fps=10, until=None):
+    """Show the listener's snapshots until the window is closed or `until()` is true."""
+    try:
+        while until is None or not until():
+            frame_start = time.perf_counter()
+            for snapshot in listener.poll():
+                view.update(snapshot)
+            view.render()
+            if view.closed():
+                return
+            time.sleep(max(0.0, 1.0 / fps - (time.perf_counter() - frame_start)))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_monitor(agent, games, workers, seed=0, genotype=None, width=10, height=20, rate=5.0, fps=10, cell=6):
+    """Play `games` games (seeds seed..seed+games-1) and show them until all are over or the window is closed."""
+    listener = SnapshotListener(("127.0.0.1", 0))
+    view = MonitorView(games, width, height, cell)
+    jobs = [(i, seed + i, agent, genotype, width, height, rate, listener.address) for i in range(games)]
+    results = []
+    with Pool(workers) as pool:
+        pending = pool.map_async(play_watched, jobs, callback=results.extend)
+        # The window may close early; the games still finish in the background
+        watch(listener, view, fps, until=pending.ready)
+        view.close()
+        listener.close()
+        pending.get()
+    return sorted(result[:3] for result in results)
+
+
+def attach(address, games=64, width=10, height=20, fps=10, cell=6):
+    """Show the games publishing to `address` (see SnapshotPublisher) until the window is closed."""
+    listener = SnapshotListener(address)
+    view = MonitorView(games, width, height, cell)
+    watch(listener, view, fps)
+    view.close()
+    listener.close()
+    return listener.received
+
+
+def measure_overhead(agent, games, workers, seed=0, genotype=None, width=10, height=20, rate=5.0, repeats=5):
+    """
+    Worker throughput (pieces per second of game time) without publishing, publishing
+    with nobody listening, and publishing to a listener drained by a thread of this
+    process as fast as a monitor would read it, `repeats` runs of each, interleaved.
+    Also returns the time a single publish() takes, with and without a listener.
+    """
+    def run(address):
+        jobs = [(i, seed + i, agent, genotype, width, height, rate, address) for i in range(games)]
+        with Pool(workers) as pool:
+            results = pool.map(play_watched, jobs)
+        return sum(r[1] for r in results) / sum(r[3] for r in results)
+
+    listener = SnapshotListener(("127.0.0.1", 0))
+    stop = threading.Event()
+
+    def drain():
+        while not stop.is_set():
+            listener.poll()
+            time.sleep(0.01)
+
+    threading.Thread(target=drain, daemon=True).start()
+    # Nothing is bound to this one
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe.bind(("127.0.0.1", 0))
+    unused = probe.getsockname()
+    probe.close()
+
+    throughput = {"off": [], "no monitor": [], "monitor": []}
+    for _ in range(repeats):
+        throughput["off"].append(run(None))
+        throughput["no monitor"].append(run(unused))
+        throughput["monitor"].append(run(listener.address))
+    time.sleep(0.1)
+    received = listener.received
+
+    from board import Board
+
+    board = Board(width, height)
+    publish_seconds = {}
+    for name, address in [("no monitor", unused), ("monitor", listener.address)]:
+        publisher = SnapshotPublisher(address, 0)
+        start = perf_counter()
+        for _ in range(10000):
+            publisher.publish(board)
+        publish_seconds[name] = (perf_counter() - start) / 10000
+    stop.set()
+    listener.close()
+    return throughput, publish_seconds, received
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py monitor", description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--attach", default=None, metavar="[HOST:]PORT", help="show the games publishing to this address instead of playing")
+    parser.add_argument("--overhead", action="store_true", help="measure worker throughput with and without a monitor")
+    parser.add_argument("--agent", choices=["greedy", "genetic", "genetic_pruned", "mcts", "mcts_array", "table"], default="greedy")
+    parser.add_argument("--games", type=int, default=64, help="games played, or grid cells with --attach")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--genotype", default=None, help="comma separated weights for the genetic agents")
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=5.0, help="snapshots per second per game")
+    parser.add_argument("--fps", type=int, default=10)
+    parser.add_argument("--cell", type=int, default=6, help="pixels per board cell")
+    args = parser.parse_args(argv)
+
+    genotype = [float(w) for w in args.genotype.split(",")] if args.genotype else None
+    if args.attach is not None:
+        received = attach(args.attach, args.games, args.width, args.height, args.fps, args.cell)
+        print(f"{received} snapshots received")
+        return
+    if args.overhead:
+        throughput, publish_seconds, received = measure_overhead(
+            args.agent, args.games, args.workers, args.seed, genotype, args.width, args.height, args.rate
+        )
+        base = np.median(throughput["off"])
+        print(f"{'':<12} {'median':>9} {'min':>7} {'max':>7}  pieces/s per worker")
+        for name, values in throughput.items():
+            median = np.median(values)
+            print(f"{name:<12} {median:>9.0f} {min(values):>7.0f} {max(values):>7.0f}  {median / base - 1:+.1%}")
+        for name, seconds in publish_seconds.items():
+            print(f"publish() with {name}: {seconds * 1e6:.1f} us, {seconds * args.rate:.4%} of a second at {args.rate:g}/s")
+        print(f"{received} snapshots received by the monitor during the games")
+        return
+    results = run_monitor(
+        args.agent,
+        args.games,
+        args.workers,
+        seed=args.seed,
+        genotype=genotype,
+        width=args.width,
+        height=args.height,
+        rate=args.rate,
+        fps=args.fps,
+        cell=args.cell,
+    )
+    for slot, dropped, rows in results:
+        print(f"{slot}, {args.seed + slot}, {dropped}, {rows}")
+
+
+if __name__ == "__main__":
+    main()
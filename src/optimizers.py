@@ -0,0 +1,102 @@
+import numpy as np
+
+"""
+Population optimizers over Genetic_AI genotypes.
+
+Both keep the population as a (pop_size, num_features) matrix and follow an
+ask/tell loop: ask() samples genotypes to evaluate, tell() updates the search
+distribution from their fitness (higher is better).
+"""
+
+
+class CrossEntropy:
+    """
+    Cross-entropy method with a diagonal Gaussian. The extra noise added to the
+    variance (decaying each epoch) keeps the distribution from collapsing early,
+    as in noisy cross-entropy for Tetris.
+    """
+
+    def __init__(self, pop_size, num_features=9, mean=None, sd=1.0, elite_frac=0.25, extra_noise=4.0, noise_decay=0.05, seed=None):
+        self.pop_size = pop_size
+        self.rng = np.random.default_rng(seed)
+        self.mean = np.zeros(num_features) if mean is None else np.array(mean, dtype=float)
+        self.var = np.full(num_features, sd ** 2)
+        self.num_elite = max(1, int(round(pop_size * elite_frac)))
+        self.extra_noise = extra_noise
+        self.noise_decay = noise_decay
+        self.epoch = 0
+
+    def ask(self):
+        return self.mean + np.sqrt(self.var) * self.rng.standard_normal((self.pop_size, len(self.mean)))
+
+    def tell(self, genotypes, fitness):
+        elite = genotypes[np.argsort(-np.asarray(fitness))[: self.num_elite]]
+        noise = max(self.extra_noise - self.noise_decay * self.epoch, 0)
+        self.mean = elite.mean(axis=0)
+        self.var = elite.var(axis=0) + noise
+        self.epoch += 1
+
+
+class CMAES:
+    """
+    CMA-ES with rank-one and rank-mu covariance updates and cumulative step
+    size adaptation, with the default strategy parameters from Hansen's tutorial.
+    """
+
+    def __init__(self, pop_size, num_features=9, mean=None, sd=0.5, seed=None):
+        if pop_size < 2:
+            raise ValueError(f"CMA-ES needs a population of at least 2, got {pop_size}")
+        n = num_features
+        self.pop_size = pop_size
+        self.rng = np.random.default_rng(seed)
+        self.mean = np.zeros(n) if mean is None else np.array(mean, dtype=float)
+        self.sigma = sd
+
+        self.mu = pop_size // 2
+        weights = np.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mu_eff = 1 / np.sum(self.weights ** 2)
+
+        self.cc = (4 + self.mu_eff / n) / (n + 4 + 2 * self.mu_eff / n)
+        self.cs = (self.mu_eff + 2) / (n + self.mu_eff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mu_eff)
+        self.cmu = min(1 - self.c1, 2 * (self.mu_eff - 2 + 1 / self.mu_eff) / ((n + 2) ** 2 + self.mu_eff))
+        self.damps = 1 + 2 * max(0, np.sqrt((self.mu_eff - 1) / (n + 1)) - 1) + self.cs
+        self.chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.C = np.eye(n)
+        self.B = np.eye(n)
+        self.D = np.ones(n)
+        self.generation = 0
+
+    def ask(self):
+        z = self.rng.standard_normal((self.pop_size, len(self.mean)))
+        return self.mean + self.sigma * (z * self.D) @ self.B.T
+
+    def tell(self, genotypes, fitness):
+        n = len(self.mean)
+        order = np.argsort(-np.asarray(fitness))[: self.mu]
+        steps = (genotypes[order] - self.mean) / self.sigma
+        old_mean = self.mean
+        self.mean = old_mean + self.sigma * self.weights @ steps
+        self.generation += 1
+
+        # Evolution paths
+        y = (self.mean - old_mean) / self.sigma
+        inv_sqrt_C = self.B @ np.diag(1 / self.D) @ self.B.T
+        self.ps = (1 - self.cs) * self.ps + np.sqrt(self.cs * (2 - self.cs) * self.mu_eff) * inv_sqrt_C @ y
+        ps_norm = np.linalg.norm(self.ps)
+        h_sigma = ps_norm / np.sqrt(1 - (1 - self.cs) ** (2 * self.generation)) < (1.4 + 2 / (n + 1)) * self.chi_n
+        self.pc = (1 - self.cc) * self.pc + h_sigma * np.sqrt(self.cc * (2 - self.cc) * self.mu_eff) * y
+
+        # Covariance and step size
+        rank_one = np.outer(self.pc, self.pc) + (1 - h_sigma) * self.cc * (2 - self.cc) * self.C
+        rank_mu = (steps * self.weights[:, None]).T @ steps
+        self.C = (1 - self.c1 - self.cmu) * self.C + self.c1 * rank_one + self.cmu * rank_mu
+        self.sigma *= np.exp((self.cs / self.damps) * (ps_norm / self.chi_n - 1))
+
+        self.C = np.triu(self.C) + np.triu(self.C, 1).T
+        eigenvalues, self.B = np.linalg.eigh(self.C)
+        self.D = np.sqrt(np.maximum(eigenvalues, 1e-20))
@@ -64,6 +64,23 @@ class Piece:
         return Piece(new_body, self.color)
 
 
+def rotations(piece):
+    """The four rotations of a piece, in the order the agents try them."""
+    result = []
+    for i in range(4):
+        piece = piece.get_next_rotation()
+        result.append(piece)
+    return result
+
+
+# BODIES index -> its four rotations
+ROTATIONS = [rotations(Piece(body, color)) for body, color in BODIES]
+
+# Unrotated piece body -> index in BODIES2, and BODIES2 index -> its four rotations
+PIECE_IDS = {tuple(body): i for i, (body, color) in enumerate(BODIES2)}
+PIECE_ROTATIONS = [rotations(Piece(body, color)) for body, color in BODIES2]
+
+
 def main():
     for b in BODIES:
         p = Piece(b)
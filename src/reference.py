@@ -0,0 +1,292 @@
+"""
+Reference implementations: the original, unoptimized board, greedy cost,
+genetic features and agents, kept as they were so that faster versions can be
+checked against them (see difftest.py). Only the board size and the genetic
+aggregate were made parameters; the behavior, quirks included, must not change:
+
+  - Board.place returns (does not raise) Exception("Bad placement")
+  - clear_rows deletes the full rows by their original indices one after the
+    other, so later indices have shifted, and recomputes heights from the
+    visible rows only
+  - the greedy cost uses the row index of the topmost filled cell as height
+  - the genetic features measure peaks from row 0, i.e. upside down
+"""
+
+from copy import deepcopy
+
+import numpy as np
+
+
+class Reference_Board:
+    def __init__(self, width=10, height=20):
+        self.width, self.height = width, height
+        self.board = self.init_board()
+        self.colors = self.init_board()
+        self.widths = [0] * (self.height + 4)
+        self.heights = [0] * self.width
+
+    def init_board(self):
+        b = []
+        for row in range(self.height + 4):
+            row = []
+            for col in range(self.width):
+                row.append(False)
+            b.append(row)
+        return b
+
+    def place(self, x, y, piece):
+        for pos in piece.body:
+            target_y = y + pos[1]
+            target_x = x + pos[0]
+            if (
+                target_y < 0
+                or target_y >= self.height + 4
+                or target_x < 0
+                or target_x >= self.width
+                or self.board[y + pos[1]][x + pos[0]]
+            ):
+                return Exception("Bad placement")
+        for pos in piece.body:
+            self.board[y + pos[1]][x + pos[0]] = True
+            self.colors[y + pos[1]][x + pos[0]] = piece.color
+            self.widths[y + pos[1]] += 1
+            self.heights[x + pos[0]] = max(self.heights[x + pos[0]], y + pos[1] + 1)
+        return 0
+
+    def drop_height(self, piece, x):
+        y = -1
+        for i in range(len(piece.skirt)):
+            y = max(self.heights[x + i] - piece.skirt[i], y)
+        return y
+
+    def top_filled(self):
+        return sum([w for w in self.widths[-4:]]) > 0
+
+    def clear_rows(self):
+        num = 0
+        to_delete = []
+        for i in range(len(self.widths)):
+            if self.widths[i] < self.width:
+                continue
+            num += 1
+            to_delete.append(i)
+
+        for row in to_delete:
+            del self.board[row]
+            self.board.append([False] * self.width)
+
+            del self.widths[row]
+            self.widths.append(0)
+
+            del self.colors[row]
+            self.colors.append([False] * self.width)
+
+        if num > 0:
+            heights = []
+            for col in range(self.width):
+                m = 0
+                for row in range(self.height):
+                    if self.board[row][col]:
+                        m = row + 1
+                heights.append(m)
+            self.heights = heights
+        return num
+
+
+def reference_cost(board, x, y, piece):
+    """Greedy_AI.cost as originally written, on a grid (list of rows)."""
+    board_copy = deepcopy(board)
+
+    for pos in piece.body:
+        board_copy[y + pos[1]][x + pos[0]] = True
+    return reference_board_cost(board_copy)
+
+
+def reference_board_cost(board_copy):
+    holes = 0
+    num_cleared = 0
+    for i in range(len(board_copy)):
+        if all(board_copy[i]):
+            num_cleared += 1
+        for j in range(len(board_copy[0])):
+            if board_copy[i][j]:
+                continue
+            has = False
+            for k in range(i + 1, len(board_copy)):
+                if board_copy[k][j]:
+                    has = True
+                    break
+            if has:
+                holes += 1
+    agg_height = 0
+    for col in range(len(board_copy[i])):
+        agg = 0
+        for row in range(len(board_copy)):
+            if board_copy[row][col]:
+                agg = row
+        agg_height += agg
+    heights = []
+    for col in range(len(board_copy[i])):
+        mh = 0
+        for row in range(len(board_copy)):
+            if board_copy[row][col]:
+                mh = row
+        heights.append(mh)
+    bumpiness = 0
+    for i in range(len(heights) - 1):
+        bumpiness += abs(heights[i] - heights[i + 1])
+
+    return 0.5 * agg_height + 0.35 * holes + 0.18 * bumpiness - 0.76 * num_cleared
+
+
+class Reference_Greedy_AI:
+    def get_best_move(self, board, piece):
+        best_x = -1
+        best_piece = None
+        min_cost = 100000000
+        for i in range(4):
+            piece = piece.get_next_rotation()
+            for x in range(board.width):
+                try:
+                    y = board.drop_height(piece, x)
+                except:
+                    continue
+                c = reference_cost(board.board, x, y, piece)
+                if c < min_cost:
+                    min_cost = c
+                    best_x = x
+                    best_piece = piece
+        return best_x, best_piece
+
+
+def bool_to_np(board):
+    f = lambda x: 1 if x == True else 0
+    return np.asarray([[f(j) for j in i] for i in board])
+
+
+def get_peaks(area):
+    peaks = np.array([])
+    for col in range(area.shape[1]):
+        if 1 in area[:, col]:
+            p = area.shape[0] - np.argmax(area[:, col], axis=0)
+            peaks = np.append(peaks, p)
+        else:
+            peaks = np.append(peaks, 0)
+    return peaks
+
+
+def get_row_transition(area, highest_peak):
+    sum = 0
+    for row in range(int(area.shape[0] - highest_peak), area.shape[0]):
+        for col in range(1, area.shape[1]):
+            if area[row, col] != area[row, col - 1]:
+                sum += 1
+    return sum
+
+
+def get_col_transition(area, peaks):
+    sum = 0
+    for col in range(area.shape[1]):
+        if peaks[col] <= 1:
+            continue
+        for row in range(int(area.shape[0] - peaks[col]), area.shape[0] - 1):
+            if area[row, col] != area[row + 1, col]:
+                sum += 1
+    return sum
+
+
+def get_bumpiness(peaks):
+    # Originally range(9), for the 10 wide board
+    s = 0
+    for i in range(len(peaks) - 1):
+        s += np.abs(peaks[i] - peaks[i + 1])
+    return s
+
+
+def get_holes(peaks, area):
+    holes = []
+    for col in range(area.shape[1]):
+        start = -peaks[col]
+        if start == 0:
+            holes.append(0)
+        else:
+            holes.append(np.count_nonzero(area[int(start) :, col] == 0))
+    return holes
+
+
+def get_wells(peaks):
+    wells = []
+    for i in range(len(peaks)):
+        if i == 0:
+            w = peaks[1] - peaks[0]
+            w = w if w > 0 else 0
+            wells.append(w)
+        elif i == len(peaks) - 1:
+            w = peaks[-2] - peaks[-1]
+            w = w if w > 0 else 0
+            wells.append(w)
+        else:
+            w1 = peaks[i - 1] - peaks[i]
+            w2 = peaks[i + 1] - peaks[i]
+            w1 = w1 if w1 > 0 else 0
+            w2 = w2 if w2 > 0 else 0
+            w = w1 if w1 >= w2 else w2
+            wells.append(w)
+    return wells
+
+
+def reference_ratings(board):
+    """The nine ratings of Genetic_AI.valuate as originally written, in genetic.RATINGS order."""
+    peaks = get_peaks(board)
+    highest_peak = np.max(peaks)
+    holes = get_holes(peaks, board)
+    wells = get_wells(peaks)
+    rating_funcs = {
+        'agg_height': np.sum(peaks),
+        'n_holes': np.sum(holes),
+        'bumpiness': get_bumpiness(peaks),
+        'num_pits': np.count_nonzero(np.count_nonzero(board, axis=0) == 0),
+        'max_wells': np.max(wells),
+        'n_cols_with_holes': np.count_nonzero(np.array(holes) > 0),
+        'row_transitions': get_row_transition(board, highest_peak),
+        'col_transitions': get_col_transition(board, peaks),
+        'cleared': np.count_nonzero(np.mean(board, axis=1))
+    }
+    return np.array([*rating_funcs.values()], dtype=float)
+
+
+class Reference_Genetic_AI:
+    def __init__(self, genotype, aggregate='lin'):
+        self.genotype = genotype
+        self.aggregate = aggregate
+
+    def valuate(self, board):
+        ratings = reference_ratings(board)
+        if self.aggregate == 'exp':
+            return np.dot(np.array([ratings[i]**self.genotype[i] for i in range(len(ratings))]), self.genotype)
+        return np.dot(ratings, self.genotype)
+
+    def get_best_move(self, board, piece):
+        best_x = -1000
+        max_value = -1000
+        best_piece = None
+        for i in range(4):
+            piece = piece.get_next_rotation()
+            for x in range(board.width):
+                try:
+                    y = board.drop_height(piece, x)
+                except:
+                    continue
+
+                board_copy = deepcopy(board.board)
+                for pos in piece.body:
+                    board_copy[y + pos[1]][x + pos[0]] = True
+
+                np_board = bool_to_np(board_copy)
+                c = self.valuate(np_board)
+
+                if c > max_value:
+                    max_value = c
+                    best_x = x
+                    best_piece = piece
+        return best_x, best_piece
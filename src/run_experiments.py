@@ -1,9 +1,19 @@
 from genetic_controller import * 
+from sweep import run_sweep
 
 def run_genetic_experiments(): 
     pop_size = [8,10,15]
     for i in pop_size:
         run_X_epochs(num_epochs=5, num_trials=2, pop_size=i, survival_rate=.2, num_elite=2, logging_file=f'genetic/data_{i}')
 
+def run_genetic_sweep(workers=None):
+    # Same grid as run_genetic_experiments, with the runs in parallel
+    spec = {
+        'name': 'genetic/sweep',
+        'search': 'grid',
+        'params': {'pop_size': [8, 10, 15], 'num_epochs': [5], 'num_trials': [2], 'survival_rate': [.2], 'num_elite': [2]},
+    }
+    return run_sweep(spec, workers=workers)
+
 if __name__ =='__main__':
     run_genetic_experiments()
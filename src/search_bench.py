@@ -0,0 +1,132 @@
+"""
+Benchmarks the cost of trying moves during search.
+
+Compares copying the board for every candidate (what MCTS and the greedy
+lookahead used to do) against Board.apply/undo on a single board, and the
+object-per-node MCTS tree against the array-backed one.
+
+    python src/search_bench.py --boards 50 --simulations 2000
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from copy import deepcopy
+
+from board import Board
+from board_scaling import make_board
+from mcts import MonteCarloTreeSearchNode, State
+from mcts_array import Array_MCTS_AI
+from piece import BODIES, Piece
+
+
+def candidates(board, piece):
+    moves = []
+    for _ in range(4):
+        piece = piece.get_next_rotation()
+        for x in range(board.width - len(piece.skirt) + 1):
+            moves.append((piece, x, board.drop_height(piece, x)))
+    return moves
+
+
+def copy_move(board, piece, x, y):
+    board_copy = Board(board.width, board.height)
+    board_copy.board = deepcopy(board.board)
+    board_copy.widths = deepcopy(board.widths)
+    board_copy.heights = deepcopy(board.heights)
+    board_copy.place(x, y, piece)
+    board_copy.clear_rows()
+    return board_copy
+
+
+def journal_move(board, piece, x, y):
+    board.undo(board.apply(x, y, piece))
+
+
+def measure(try_move, work):
+    """Return (microseconds per move, bytes allocated per move)."""
+    moves = sum(len(m) for _, m in work)
+    start = time.perf_counter()
+    for board, board_moves in work:
+        for piece, x, y in board_moves:
+            try_move(board, piece, x, y)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    allocated = 0
+    for board, board_moves in work[:5]:
+        for piece, x, y in board_moves:
+            tracemalloc.reset_peak()
+            try_move(board, piece, x, y)
+            allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    sampled = sum(len(m) for _, m in work[:5])
+    return seconds / moves * 1e6, allocated / sampled
+
+
+def count_nodes(node):
+    return 1 + sum(count_nodes(c) for c in node.children)
+
+
+def object_tree_search(board, piece, simulations):
+    """Returns (nodes, seconds, bytes held by the tree)."""
+    def search():
+        root = MonteCarloTreeSearchNode(State(board, piece, 0))
+        root.simulations = simulations
+        root.best_action()
+        return root
+
+    start = time.perf_counter()
+    search()
+    seconds = time.perf_counter() - start
+    # Trace a second search separately so tracing does not skew the timing
+    tracemalloc.start()
+    root = search()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return count_nodes(root), seconds, held
+
+
+def array_tree_search(board, piece, simulations):
+    """Returns (nodes, seconds, bytes held by the tree)."""
+    ai = Array_MCTS_AI(simulations=simulations, capacity=simulations * 40 + 100, width=board.width, height=board.height)
+    start = time.perf_counter()
+    ai.get_best_move(board, piece)
+    seconds = time.perf_counter() - start
+    # The pool is preallocated, so report what the used nodes occupy
+    return ai.tree.size, seconds, ai.tree.nbytes() / ai.tree.capacity * ai.tree.size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Board copies versus apply/undo during search")
+    parser.add_argument("--boards", type=int, default=50)
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=20)
+    parser.add_argument("--simulations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    work = []
+    for _ in range(args.boards):
+        board = make_board(args.width, args.height, 0.4, rng)
+        work.append((board, candidates(board, Piece(*rng.choice(BODIES)))))
+
+    print(f"{'method':<10} {'us/move':>9} {'bytes/move':>11}")
+    for name, try_move in [("copy", copy_move), ("apply/undo", journal_move)]:
+        us, allocated = measure(try_move, work)
+        print(f"{name:<10} {us:>9.2f} {allocated:>11.0f}")
+
+    print()
+    print(f"{'tree':<10} {'nodes':>9} {'nodes/s':>9} {'bytes/node':>11}")
+    board, moves = work[0]
+    piece = moves[0][0]
+    for name, search in [("object", object_tree_search), ("array", array_tree_search)]:
+        nodes, seconds, held = search(board, piece, args.simulations)
+        print(f"{name:<10} {nodes:>9} {nodes / seconds:>9.0f} {held / nodes:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Shared-memory fitness evaluation on the local cores.
+
+    with SharedEvaluator(workers=16) as evaluator:
+        run_X_epochs(..., evaluator='shared', coordinator=evaluator)
+
+Once per evaluate() call (once per epoch) the genotype matrix, the seeds and a
+prefix of every trial's piece sequence are written to named shared memory
+blocks, next to a (2, pop_size, num_trials) result block. Workers of a
+persistent process pool only receive the block names; they attach to them,
+build each agent around a view of its genotype row, play from a view of the
+sequence, take jobs from a shared counter and write pieces dropped and rows
+cleared straight into the result block. Games that outlast the prefix carry on
+with the seed's own generator, so every game is the one
+Game('genetic', agent, seed=seed).run_no_visual() would play.
+
+`ipc_bytes` counts what still goes through the pool's pipes (the pickled tasks
+and the per-worker game counts); compare it with `naive_bytes_per_game`.
+
+    python src/shared_eval.py --pop 32 --trials 4 --workers 8
+"""
+
+import argparse
+import itertools
+import multiprocessing as mp
+import os
+import pickle
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from lockstep import piece_sequence
+
+NUM_FEATURES = 9
+# Pieces of each sequence placed in shared memory; longer games continue from the seed
+PREFIX = 4096
+
+counter = None  # Next job index, shared by the workers of a pool
+
+
+class SharedArray:
+    """A numpy array in a named shared memory block, created or attached by name."""
+
+    def __init__(self, shape, dtype, name=None):
+        dtype = np.dtype(dtype)
+        if name is None:
+            size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+
+    @property
+    def spec(self):
+        return self.shm.name, self.array.shape, self.array.dtype.str
+
+    def close(self):
+        # Views into the buffer must be gone before the mapping can be closed
+        del self.array
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
+
+
+def init_worker(job_counter):
+    global counter
+    counter = job_counter
+
+
+def shared_pieces(prefix, seed):
+    """Yield BODIES indices from the shared prefix, then from the seed's own generator."""
+    for body in prefix:
+        yield int(body)
+    yield from itertools.islice(piece_sequence(seed), len(prefix), None)
+
+
+def play_jobs(task):
+    """Play jobs from the shared counter until none are left; runs inside a worker."""
+    from game import Game
+    from genetic import Genetic_AI
+    from monitor import SnapshotPublisher
+
+    genotypes_spec, pieces_spec, seeds_spec, results_spec, aggregate, monitor = task
+    blocks = [SharedArray(shape, dtype, name) for name, shape, dtype in (genotypes_spec, pieces_spec, seeds_spec, results_spec)]
+    genotypes, pieces, seeds, results = (block.array for block in blocks)
+    num_trials = len(seeds)
+    played = 0
+    agent = game = None
+    try:
+        while True:
+            with counter.get_lock():
+                job = counter.value
+                counter.value += 1
+            if job >= results[0].size:
+                break
+            a, t = divmod(job, num_trials)
+            agent = Genetic_AI(genotype=genotypes[a], aggregate=aggregate)
+            publisher = None if monitor is None else SnapshotPublisher(monitor, job)
+            game = Game("genetic", agent=agent, pieces=shared_pieces(pieces[t], int(seeds[t])), recorder=publisher)
+            results[0, a, t], results[1, a, t] = game.run_no_visual(verbose=False)
+            if publisher is not None:
+                publisher.publish(game.board, done=True)
+            played += 1
+    finally:
+        del genotypes, pieces, seeds, results, agent, game
+        for block in blocks:
+            block.close()
+    return played
+
+
+class SharedEvaluator:
+    """
+    Local counterpart of distributed.Coordinator: evaluate(genotypes, seeds)
+    on a process pool, with the inputs and results in shared memory.
+    """
+
+    def __init__(self, workers=None, prefix=PREFIX):
+        self.workers = workers or os.cpu_count()
+        self.prefix = prefix
+        self.counter = mp.Value("q", 0)
+        # Started before the pool so the workers share it; a worker's own tracker
+        # would unlink the blocks it attached to when the worker exits
+        resource_tracker.ensure_running()
+        self.pool = mp.Pool(self.workers, initializer=init_worker, initargs=(self.counter,))
+        self.games = 0
+        self.ipc_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def evaluate(self, genotypes, seeds, aggregate="lin", monitor=None):
+        """
+        Play every genotype on every seed on the pool. Returns
+        (pieces_dropped, rows_cleared), each of shape (pop_size, len(seeds)).
+        With `monitor` ('host:port'), games publish snapshots there for monitor.py.
+        """
+        from monitor import with_run_id
+
+        monitor = with_run_id(monitor)
+        genotypes = np.asarray(genotypes, dtype=float)
+        pop_size, num_trials = len(genotypes), len(seeds)
+        blocks = [
+            SharedArray(genotypes.shape, np.float64),
+            SharedArray((num_trials, self.prefix), np.uint8),
+            SharedArray((num_trials,), np.uint64),
+            SharedArray((2, pop_size, num_trials), np.int64),
+        ]
+        try:
+            shared_genotypes, pieces, shared_seeds, results = (block.array for block in blocks)
+            shared_genotypes[:] = genotypes
+            shared_seeds[:] = seeds
+            for t, seed in enumerate(seeds):
+                pieces[t] = np.fromiter(itertools.islice(piece_sequence(seed), self.prefix), dtype=np.uint8, count=self.prefix)
+            results[:] = -1
+            self.counter.value = 0
+
+            task = tuple(block.spec for block in blocks) + (aggregate, monitor)
+            tasks = [task] * min(self.workers, pop_size * num_trials)
+            played = self.pool.map(play_jobs, tasks, chunksize=1)
+            self.ipc_bytes += len(tasks) * len(pickle.dumps((play_jobs, task))) + len(pickle.dumps(played))
+            self.games += sum(played)
+
+            pieces_dropped, rows_cleared = results[0].copy(), results[1].copy()
+            del shared_genotypes, pieces, shared_seeds, results
+        finally:
+            for block in blocks:
+                block.unlink()
+        return pieces_dropped, rows_cleared
+
+    @property
+    def ipc_bytes_per_game(self):
+        return self.ipc_bytes / self.games if self.games else 0.0
+
+
+def naive_bytes_per_game(genotype, seed, pieces, aggregate="lin"):
+    """Pickled size of shipping one game as (Genetic_AI, piece sequence) to a worker."""
+    from genetic import Genetic_AI
+
+    agent = Genetic_AI(genotype=np.asarray(genotype, dtype=float), aggregate=aggregate)
+    sequence = list(itertools.islice(piece_sequence(seed), pieces))
+    return len(pickle.dumps((agent, sequence))) + len(pickle.dumps((pieces, 0)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared-memory evaluation of a random population")
+    parser.add_argument("--pop", type=int, default=32)
+    parser.add_argument("--trials", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--prefix", type=int, default=PREFIX)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="compare with lockstep.play_population")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    genotypes = rng.uniform(-1, 1, (args.pop, NUM_FEATURES))
+    seeds = [args.seed + t for t in range(args.trials)]
+    start = time.perf_counter()
+    with SharedEvaluator(workers=args.workers, prefix=args.prefix) as evaluator:
+        pieces_dropped, rows_cleared = evaluator.evaluate(genotypes, seeds)
+    elapsed = time.perf_counter() - start
+    games = pieces_dropped.size
+    naive = np.mean([
+        naive_bytes_per_game(genotypes[a], seeds[t], pieces_dropped[a, t] + 1)
+        for a in range(args.pop)
+        for t in range(args.trials)
+    ])
+    print(f"{games} games, {pieces_dropped.sum()} pieces in {elapsed:.2f}s")
+    print(f"IPC bytes per game: {evaluator.ipc_bytes_per_game:.1f} (pickled agent and sequence: {naive:.1f})")
+    if args.check:
+        from lockstep import play_population
+
+        expected = play_population(genotypes, seeds)
+        same = np.array_equal(expected[0], pieces_dropped) and np.array_equal(expected[1], rows_cleared)
+        print("matches lockstep.play_population" if same else "DIFFERS from lockstep.play_population")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Survival-time fitness estimates: play only the first `prefix` pieces of each
+game and extrapolate the expected number of pieces until top-out.
+
+After every piece the game's risk signals are recorded: stack height (rows up
+to the highest filled cell), holes, and whether the stack is within
+`NEAR_TOP` rows of the top. Top-out is the stack reaching level height + 1, so
+the model looks at how often the stack climbs through each level: the
+upcrossing counts of the levels from the median stack height up to the top-out
+level are fitted as Poisson counts whose log rate is linear in the level, and
+the fitted rate at the top-out level is the per-piece hazard of dying. Games
+that topped out inside the prefix count exactly; the others are expected to
+last another 1 / hazard pieces, since the hazard does not depend on how long
+the game has already lasted. The uncertainty comes from the fit's standard
+error of the log hazard, widened when the counts are overdispersed.
+
+A stack that never climbs leaves the upper levels without upcrossings, and the
+slope then only comes from its weak prior, so the extrapolation is bounded: a
+game is expected to last at most `MAX_EXTRAPOLATION` times the pieces it
+played, and a calibrated estimate at most `CALIBRATED_RANGE` times the longest
+full games the calibration was fit on. An estimate that hits either bound is
+flagged `censored`: the agent lasts at least that long, as far as the prefix
+can tell, and its upper bound is infinite.
+
+`calibrate` plays full games, compares them with the estimates of their
+prefixes and fits log(full) = a + b log(estimate), which `SurvivalEstimator`
+applies when a calibration for its aggregate, board size and prefix is saved.
+
+    python src/survival.py calibrate --agents 12 --trials 3 --prefixes 100 250 500
+    run_X_epochs(..., evaluator='survival', coordinator=SurvivalEstimator(prefix=250))
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+SURVIVAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "survival")
+CALIBRATION_FILE = os.path.join(SURVIVAL_DIR, "calibration.json")
+
+PREFIX = 250
+NEAR_TOP = 4  # rows below the top that count as near top-out
+RIDGE = 0.1  # weak prior on the slope, so a stack that never climbs still gives a finite fit
+MAX_EXTRAPOLATION = 1000  # expected pieces of a game that is still alive, in pieces played
+CALIBRATED_RANGE = 10  # calibrated estimates, in the longest mean game seen by the calibration
+
+
+class RiskRecorder:
+    """Game recorder keeping the stack height and holes after every piece."""
+
+    def __init__(self):
+        self.board = None
+        self.stack = []
+        self.holes = []
+
+    def record(self, board, piece, x, y, placed):
+        self.board = board
+
+    def set_last_reward(self, reward):
+        area = np.asarray(self.board.board, dtype=bool)
+        # Rows up to the highest filled cell of each column
+        tops = np.where(area.any(axis=0), len(area) - np.argmax(area[::-1], axis=0), 0)
+        self.stack.append(int(tops.max()))
+        self.holes.append(int(tops.sum() - area.sum()))
+
+
+def play_trace(job):
+    """Play one genotype on one seed for at most `max_pieces` pieces and record its risk signals."""
+    from game import Game
+    from genetic import Genetic_AI
+    from genetic_pruned import Pruned_Genetic_AI
+    from monitor import SnapshotPublisher
+
+    genotype, seed, aggregate, max_pieces, width, height, slot, monitor = job
+    genotype = np.asarray(genotype, dtype=float)
+    # Same moves as Genetic_AI, with less work per move
+    agent = Pruned_Genetic_AI(genotype=genotype) if aggregate == "lin" else Genetic_AI(genotype=genotype, aggregate=aggregate)
+    recorder = RiskRecorder()
+    publisher = None if monitor is None else SnapshotPublisher(monitor, slot, recorder=recorder)
+    game = Game("genetic", agent=agent, seed=seed, width=width, height=height, recorder=publisher or recorder)
+    game.run_no_visual(verbose=False, max_pieces=max_pieces)
+    if publisher is not None:
+        publisher.publish(game.board, done=True)
+    return {
+        "stack": np.array(recorder.stack),
+        "holes": np.array(recorder.holes),
+        "topped_out": game.board.top_filled(),
+    }
+
+
+def truncate(trace, prefix):
+    """The trace the same game would have left after at most `prefix` pieces."""
+    if len(trace["stack"]) <= prefix:
+        return trace
+    return {"stack": trace["stack"][:prefix], "holes": trace["holes"][:prefix], "topped_out": False}
+
+
+def upcrossings(stacks, top_level):
+    """Number of pieces that took the stack from below level h to at least h, for h = 1..top_level."""
+    counts = np.zeros(top_level + 2, dtype=int)
+    for stack in stacks:
+        before = np.concatenate([[0], stack[:-1]])
+        after = np.minimum(stack, top_level)
+        up = after > before
+        # Difference array: a step from `before` to `after` crosses levels before+1..after
+        np.add.at(counts, before[up] + 1, 1)
+        np.add.at(counts, after[up] + 1, -1)
+    return np.cumsum(counts)[1 : top_level + 1]
+
+
+def fit_hazard(stacks, top_level):
+    """
+    Log of the per-piece rate of reaching `top_level` and its standard error,
+    from a Poisson fit of log(upcrossings per piece) = log_rate + slope * (level - top_level).
+    """
+    pieces = sum(len(stack) for stack in stacks)
+    counts = upcrossings(stacks, top_level)
+    start = max(int(np.median(np.concatenate(stacks))), 1)
+    levels = np.arange(start, top_level + 1)
+    y = counts[levels - 1]
+    X = np.column_stack([np.ones(len(levels)), levels - top_level])
+    penalty = np.diag([0.0, RIDGE])
+    beta = np.array([np.log(max(y.sum(), 0.5) / (pieces * len(levels))), 0.0])
+    for _ in range(100):
+        mu = pieces * np.exp(X @ beta)
+        hessian = X.T @ (mu[:, None] * X) + penalty
+        step = np.linalg.solve(hessian, X.T @ (y - mu) - penalty @ beta)
+        beta += step
+        if np.abs(step).max() < 1e-10:
+            break
+    mu = pieces * np.exp(X @ beta)
+    covariance = np.linalg.inv(X.T @ (mu[:, None] * X) + penalty)
+    # Climbs come in bursts, not independently: widen by the Pearson dispersion
+    dispersion = np.sum((y - mu) ** 2 / mu) / (len(levels) - 2) if len(levels) > 2 else 1.0
+    return beta[0], np.sqrt(covariance[0, 0] * max(dispersion, 1.0))
+
+
+def estimate(traces, height=20, z=1.96, calibration=None):
+    """
+    Expected pieces to top-out of one agent from the traces of its prefix
+    games, with a (low, high) interval and the risk signals behind it.
+    """
+    top_level = height + 1
+    stacks = [trace["stack"] for trace in traces]
+    played = np.array([len(stack) for stack in stacks])
+    died = np.array([trace["topped_out"] for trace in traces])
+    log_hazard, se = fit_hazard(stacks, top_level)
+
+    def expected(log_rate):
+        # Clipped in log space, so a near-zero hazard neither overflows nor runs away
+        remaining = np.exp(np.minimum(-log_rate, np.log(MAX_EXTRAPOLATION * played)))
+        return float(np.mean(np.where(died, played, played + remaining)))
+
+    mean, low, high = expected(log_hazard), expected(log_hazard + z * se), expected(log_hazard - z * se)
+    ceiling = expected(-np.inf)
+    if calibration is not None and not died.all():
+        a, b, sd = calibration["a"], calibration["b"], calibration["sd"]
+        ceiling = min(np.exp(a + b * np.log(ceiling)), CALIBRATED_RANGE * calibration["max_full"])
+        mean = float(min(np.exp(a + b * np.log(mean)), ceiling))
+        low = float(min(np.exp(a + b * np.log(low) - z * sd), ceiling))
+        high = float(min(np.exp(a + b * np.log(high) + z * sd), ceiling))
+    censored = not died.all() and mean >= ceiling
+    all_stacks = np.concatenate(stacks)
+    return {
+        "mean": mean,
+        "low": low,
+        "high": np.inf if censored else high,
+        "censored": bool(censored),
+        "pieces_played": int(played.sum()),
+        "topped_out": int(died.sum()),
+        "log_hazard": float(log_hazard),
+        "log_hazard_se": float(se),
+        "mean_stack": float(all_stacks.mean()),
+        "max_stack": int(all_stacks.max()),
+        "mean_holes": float(np.concatenate([trace["holes"] for trace in traces]).mean()),
+        "near_top": float(np.mean(all_stacks > height - NEAR_TOP)),
+    }
+
+
+def calibration_key(prefix, width=10, height=20, aggregate="lin"):
+    return f"{aggregate}/{width}x{height}/{prefix}"
+
+
+def load_calibration(prefix, width=10, height=20, aggregate="lin", path=CALIBRATION_FILE):
+    """The saved calibration for this prefix, board size and aggregate, or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        calibrations = json.load(f)
+    return calibrations.get(calibration_key(prefix, width, height, aggregate))
+
+
+def save_calibration(fits, width=10, height=20, aggregate="lin", path=CALIBRATION_FILE):
+    calibrations = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            calibrations = json.load(f)
+    for fit in fits:
+        key = calibration_key(fit["prefix"], width, height, aggregate)
+        calibrations[key] = {k: fit[k] for k in ("a", "b", "sd", "max_full", "agents")}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(calibrations, f, indent=1)
+
+
+class SurvivalEstimator:
+    """
+    Fitness from bounded prefixes of games: evaluate(genotypes, seeds) returns
+    the estimated expected pieces to top-out of every genotype with its interval.
+    """
+
+    def __init__(self, prefix=PREFIX, workers=None, width=10, height=20, z=1.96, calibration=True):
+        self.prefix = prefix
+        self.workers = workers
+        self.width, self.height = width, height
+        self.z = z
+        # True: the saved calibration of each aggregate; a fit dict or None applies to all of them
+        self.calibration = calibration
+        self.games = 0
+        self.pieces = 0
+
+    def evaluate(self, genotypes, seeds, aggregate="lin", monitor=None):
+        """
+        Returns (mean, low, high) arrays and the per-genotype estimates. With
+        `monitor` ('host:port'), games publish snapshots there for monitor.py.
+        """
+        from monitor import with_run_id
+
+        monitor = with_run_id(monitor)
+        genotypes = np.asarray(genotypes, dtype=float)
+        jobs = [
+            (g, seed, aggregate, self.prefix, self.width, self.height, a * len(seeds) + t, monitor)
+            for a, g in enumerate(genotypes)
+            for t, seed in enumerate(seeds)
+        ]
+        if self.workers:
+            with Pool(self.workers) as pool:
+                traces = pool.map(play_trace, jobs)
+        else:
+            traces = [play_trace(job) for job in jobs]
+        if self.calibration is True:
+            calibration = load_calibration(self.prefix, self.width, self.height, aggregate)
+        else:
+            calibration = self.calibration or None
+        estimates = [
+            estimate(traces[i : i + len(seeds)], self.height, self.z, calibration)
+            for i in range(0, len(traces), len(seeds))
+        ]
+        self.games += len(traces)
+        self.pieces += sum(e["pieces_played"] for e in estimates)
+        mean, low, high = (np.array([e[k] for e in estimates]) for k in ("mean", "low", "high"))
+        return mean, low, high, estimates
+
+
+def ranks(values):
+    return np.argsort(np.argsort(values))
+
+
+def spearman(a, b):
+    return float(np.corrcoef(ranks(a), ranks(b))[0, 1])
+
+
+def calibrate(genotypes, seeds, prefixes=(100, 250, 500), max_pieces=None, workers=None, width=10, height=20, z=1.96, aggregate="lin"):
+    """
+    Play every genotype on every seed to top-out (or `max_pieces`) and compare
+    the mean pieces dropped with the estimate from each prefix of the same
+    games. Returns one fit per prefix and the per-agent rows.
+    """
+    jobs = [(g, seed, aggregate, max_pieces, width, height, 0, None) for g in genotypes for seed in seeds]
+    if workers:
+        with Pool(workers) as pool:
+            traces = pool.map(play_trace, jobs)
+    else:
+        traces = [play_trace(job) for job in jobs]
+    per_agent = [traces[i : i + len(seeds)] for i in range(0, len(traces), len(seeds))]
+    full = np.array([np.mean([len(t["stack"]) for t in agent]) for agent in per_agent])
+    # Games stopped at max_pieces only give a lower bound on the truth
+    complete = np.array([all(t["topped_out"] for t in agent) for agent in per_agent])
+
+    fits, rows = [], []
+    for prefix in prefixes:
+        estimates = [estimate([truncate(t, prefix) for t in agent], height, z) for agent in per_agent]
+        mean = np.array([e["mean"] for e in estimates])
+        low = np.array([e["low"] for e in estimates])
+        high = np.array([e["high"] for e in estimates])
+        exact = np.array([e["topped_out"] == len(seeds) for e in estimates])
+        cost = sum(e["pieces_played"] for e in estimates) / sum(len(t["stack"]) for t in traces)
+        # Only games the prefix did not settle carry information about the extrapolation
+        use = complete & ~exact
+        if use.sum() >= 3:
+            X = np.column_stack([np.ones(use.sum()), np.log(mean[use])])
+            (a, b), *_ = np.linalg.lstsq(X, np.log(full[use]), rcond=None)
+            residuals = np.log(full[use]) - X @ (a, b)
+            sd = float(np.sqrt(residuals @ residuals / max(use.sum() - 2, 1)))
+        else:
+            a, b, sd = 0.0, 1.0, 0.0
+        max_full = float(full[complete].max()) if complete.any() else float(full.max())
+        fit = {"prefix": prefix, "a": float(a), "b": float(b), "sd": sd, "max_full": max_full, "agents": int(use.sum())}
+        calibrated = [estimate([truncate(t, prefix) for t in agent], height, z, fit) for agent in per_agent]
+        fit.update({
+            "spearman": spearman(mean[complete], full[complete]) if complete.sum() > 1 else float("nan"),
+            "coverage": float(np.mean((low <= full) & (full <= high))),
+            "calibrated_coverage": float(np.mean([e["low"] <= f <= e["high"] for e, f in zip(calibrated, full)])),
+            "cost": cost,
+        })
+        fits.append(fit)
+        rows.extend(
+            {"prefix": prefix, "agent": i, "full": float(full[i]), "complete": bool(complete[i]), **e}
+            for i, e in enumerate(estimates)
+        )
+    return fits, rows
+
+
+def calibration_genotypes(agents, noise, seed=0):
+    """The tournament's best genotype under multiplicative noise from 0 to `noise`, for a spread of skill."""
+    from tournament import GENOTYPE
+
+    rng = np.random.default_rng(seed)
+    return [np.array(GENOTYPE) * rng.normal(1, sd, len(GENOTYPE)) for sd in np.linspace(0, noise, agents)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Survival-time fitness estimates from game prefixes")
+    parser.add_argument("role", choices=["calibrate"])
+    parser.add_argument("--agents", type=int, default=12)
+    parser.add_argument("--noise", type=float, default=1.0, help="largest multiplicative noise on the base genotype")
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--prefixes", type=int, nargs="+", default=[100, 250, 500])
+    parser.add_argument("--max-pieces", type=int, default=None, help="stop full games here (they then only bound the truth)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=20)
+    parser.add_argument("--aggregate", choices=["lin", "exp"], default="lin", help="aggregate the calibration agents play with")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", action="store_true", help=f"store the fits in {os.path.relpath(CALIBRATION_FILE)}")
+    args = parser.parse_args(argv)
+
+    genotypes = calibration_genotypes(args.agents, args.noise, args.seed)
+    seeds = [args.seed + t for t in range(args.trials)]
+    start = time.perf_counter()
+    fits, rows = calibrate(genotypes, seeds, args.prefixes, args.max_pieces, args.workers, args.width, args.height, aggregate=args.aggregate)
+    print(f"{len(genotypes)} agents x {len(seeds)} full games in {time.perf_counter() - start:.0f}s", file=sys.stderr)
+
+    print(f"{'prefix':>6} {'agent':>5} {'full':>8} {'estimate':>9} {'interval':>19} {'stack':>6} {'holes':>6} {'near top':>8}")
+    for r in rows:
+        interval = f"{r['low']:.0f}-{r['high']:.0f}"
+        mark = ("" if r["complete"] else " (capped)") + (" (censored)" if r["censored"] else "")
+        print(
+            f"{r['prefix']:>6} {r['agent']:>5} {r['full']:>8.0f} {r['mean']:>9.0f} {interval:>19} "
+            f"{r['mean_stack']:>6.1f} {r['mean_holes']:>6.1f} {r['near_top']:>8.3f}{mark}"
+        )
+    print(f"\n{'prefix':>6} {'cost':>6} {'spearman':>8} {'coverage':>8} {'calibrated':>10} {'a':>7} {'b':>6} {'sd':>6} {'agents':>6}")
+    for fit in fits:
+        print(
+            f"{fit['prefix']:>6} {fit['cost']:>6.1%} {fit['spearman']:>8.3f} {fit['coverage']:>8.1%} {fit['calibrated_coverage']:>10.1%} "
+            f"{fit['a']:>7.3f} {fit['b']:>6.3f} {fit['sd']:>6.3f} {fit['agents']:>6}"
+        )
+    if args.save:
+        save_calibration(fits, args.width, args.height, args.aggregate)
+
+
+if __name__ == "__main__":
+    main()
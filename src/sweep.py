@@ -0,0 +1,174 @@
+"""
+Hyperparameter sweeps over run_X_epochs, run concurrently within a budget of cores.
+
+    cd src && python sweep.py sweep.json --cores 8
+
+The spec is a JSON file such as
+
+    {"name": "pop_sweep", "search": "grid",
+     "params": {"pop_size": [8, 10, 15], "num_elite": [2], "survival_rate": [0.2],
+                "num_trials": [2], "num_epochs": [5], "aggregate": ["lin"]}}
+
+With "search": "random", "samples": N draws N configurations; a parameter is
+then either a list to choose from or {"low": a, "high": b} (integers if both
+bounds are integers). Each run logs to data/<name>/<config>.csv like
+run_X_epochs; runs whose log already holds every epoch are skipped, and
+data/<name>/index.csv summarizes all runs.
+
+A run takes one core, except with the 'shared' and 'survival' evaluators,
+which play on a process pool of their own: such a run is given an equal share
+of the cores (or "workers" of them, if the spec sets it) as its pool size, and
+only as many runs start as fit in the budget. 'distributed' needs a
+distributed.Coordinator, which a spec cannot describe, so it is rejected.
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+ABBREVIATIONS = {
+    "pop_size": "pop",
+    "num_elite": "elite",
+    "survival_rate": "surv",
+    "num_trials": "trials",
+    "num_epochs": "epochs",
+    "aggregate": "agg",
+    "evaluator": "eval",
+}
+# Evaluators that start a process pool sized by run_X_epochs(workers=...)
+POOL_EVALUATORS = {"shared", "survival"}
+# Evaluators that need a live object passed as run_X_epochs(coordinator=...)
+COORDINATOR_EVALUATORS = {"distributed"}
+
+
+def expand_spec(spec):
+    """List of parameter dicts described by a sweep spec."""
+    params = spec["params"]
+    names = sorted(params)
+    if spec.get("search", "grid") == "grid":
+        return check_configs([dict(zip(names, values)) for values in itertools.product(*(params[n] for n in names))])
+
+    rng = random.Random(spec.get("seed", 0))
+    configs = []
+    for _ in range(spec["samples"]):
+        config = {}
+        for name in names:
+            values = params[name]
+            if isinstance(values, list):
+                config[name] = rng.choice(values)
+            elif isinstance(values["low"], int) and isinstance(values["high"], int):
+                config[name] = rng.randint(values["low"], values["high"])
+            else:
+                config[name] = round(rng.uniform(values["low"], values["high"]), 3)
+        if config not in configs:
+            configs.append(config)
+    return check_configs(configs)
+
+
+def check_configs(configs):
+    for config in configs:
+        if config.get("evaluator") in COORDINATOR_EVALUATORS:
+            raise ValueError(f"evaluator '{config['evaluator']}' needs a coordinator object, which a sweep spec cannot provide")
+    return configs
+
+
+def config_name(config):
+    return "_".join(f"{ABBREVIATIONS.get(k, k)}{config[k]}" for k in sorted(config))
+
+
+def completed_epochs(path):
+    if not os.path.exists(path):
+        return 0
+    # The first row is the placeholder written before epoch 0
+    return max(len(pd.read_csv(path)) - 1, 0)
+
+
+def run_cores(config, share):
+    """Cores a run uses: its evaluator's pool size, or one."""
+    if config.get("evaluator") in POOL_EVALUATORS:
+        return config.get("workers", share)
+    return 1
+
+
+def run_config(config, logging_file, cores):
+    """Run one configuration in a worker process, with its prints sent to a log file."""
+    from genetic_controller import run_X_epochs
+
+    if config.get("evaluator") in POOL_EVALUATORS:
+        config = dict(config, workers=cores)
+    with open(f"data/{logging_file}.log", "w") as log, contextlib.redirect_stdout(log):
+        run_X_epochs(logging_file=logging_file, **config)
+    return config
+
+
+def summarize(configs, name):
+    rows = []
+    for config in configs:
+        logging_file = f"{name}/{config_name(config)}"
+        row = dict(config, logging_file=logging_file, epochs_done=completed_epochs(f"data/{logging_file}.csv"))
+        if row["epochs_done"]:
+            last = pd.read_csv(f"data/{logging_file}.csv").iloc[-1]
+            row.update(avg_fit=last["avg_fit"], top_fit=last["top_fit"], elite_fit=last["elite_fit"])
+        rows.append(row)
+    index = pd.DataFrame(rows)
+    index.to_csv(f"data/{name}/index.csv", index=False)
+    return index
+
+
+def run_sweep(spec, cores=None):
+    """Run every configuration of the spec not already complete, on at most `cores` cores at a time."""
+    name = spec["name"]
+    configs = expand_spec(spec)
+    os.makedirs(f"data/{name}", exist_ok=True)
+
+    todo = []
+    for config in configs:
+        logging_file = f"{name}/{config_name(config)}"
+        if completed_epochs(f"data/{logging_file}.csv") >= config.get("num_epochs", 10):
+            print(f"skip {logging_file}")
+            continue
+        todo.append((config, logging_file))
+
+    cores = cores or os.cpu_count()
+    share = max(cores // max(len(todo), 1), 1)
+    queue = [(config, logging_file, min(run_cores(config, share), cores)) for config, logging_file in todo]
+    with ProcessPoolExecutor(max_workers=cores) as pool:
+        futures, used, n = {}, 0, 0
+        while queue or futures:
+            # Start runs in order while their cores fit in what is left of the budget
+            while queue and used + queue[0][2] <= cores:
+                config, logging_file, run_size = queue.pop(0)
+                futures[pool.submit(run_config, config, logging_file, run_size)] = (logging_file, run_size)
+                used += run_size
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                logging_file, run_size = futures.pop(future)
+                used -= run_size
+                n += 1
+                try:
+                    future.result()
+                    print(f"[{n}/{len(todo)}] done {logging_file}")
+                except Exception as e:
+                    print(f"[{n}/{len(todo)}] failed {logging_file}: {e!r}")
+
+    return summarize(configs, name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel run_X_epochs sweeps")
+    parser.add_argument("spec", help="JSON sweep spec")
+    parser.add_argument("--cores", type=int, default=os.cpu_count(), help="cores shared by the runs and their evaluators' pools")
+    args = parser.parse_args(argv)
+    with open(args.spec) as f:
+        spec = json.load(f)
+    print(run_sweep(spec, cores=args.cores).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Structured progress of long training and batch runs.
+
+A Telemetry object counts games, pieces and evaluated agents and, at most every
+`interval` seconds, appends a JSON snapshot (epoch, agents evaluated, games/s,
+pieces/s, best fitness so far, ETA) to data/telemetry/<name>.jsonl. The file is
+rotated to <name>.jsonl.1, .2, ... once it reaches `max_bytes`. With a `port`,
+the latest snapshot is also served as JSON on http://127.0.0.1:<port>/.
+
+    telemetry = Telemetry("pop_sweep/pop10", port=8765)
+    run_X_epochs(..., telemetry=telemetry)
+
+    python src/telemetry.py            # latest snapshot of every run
+"""
+
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TELEMETRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "telemetry")
+
+
+class Telemetry:
+    def __init__(self, name, directory=TELEMETRY_DIR, interval=5.0, max_bytes=1 << 20, backups=3, port=None):
+        self.name = name
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.start = time.time()
+        self.last_publish = 0.0
+        self.epoch = 0
+        self.num_epochs = None
+        self.agents_per_epoch = None
+        self.agents_evaluated = 0  # in the current epoch
+        self.total_agents = 0
+        self.games = 0
+        self.pieces = 0
+        self.best_fitness = None
+        self.latest = self.snapshot()
+        self.server = None
+        if port is not None:
+            self.serve(port)
+
+    def serve(self, port):
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(telemetry.latest).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return None if self.server is None else f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def start_epoch(self, epoch, num_epochs=None, agents=None):
+        self.epoch = epoch
+        self.num_epochs = num_epochs
+        self.agents_per_epoch = agents
+        self.agents_evaluated = 0
+        self.maybe_publish()
+
+    def game(self, pieces, n=1):
+        """Count `n` finished games that dropped `pieces` pieces in total."""
+        self.games += n
+        self.pieces += int(pieces)
+        self.maybe_publish()
+
+    def agents(self, fitness):
+        """Count evaluated agents, given their fitness values."""
+        fitness = [float(f) for f in fitness]
+        self.agents_evaluated += len(fitness)
+        self.total_agents += len(fitness)
+        if fitness:
+            best = max(fitness)
+            if self.best_fitness is None or best > self.best_fitness:
+                self.best_fitness = best
+        self.maybe_publish()
+
+    def eta(self, elapsed):
+        if not self.num_epochs or not self.agents_per_epoch or not self.total_agents:
+            return None
+        remaining = (self.num_epochs - self.epoch) * self.agents_per_epoch - self.agents_evaluated
+        return max(remaining, 0) * elapsed / self.total_agents
+
+    def snapshot(self):
+        now = time.time()
+        elapsed = max(now - self.start, 1e-9)
+        return {
+            "run": self.name,
+            "pid": os.getpid(),
+            "time": now,
+            "elapsed": elapsed,
+            "epoch": self.epoch,
+            "num_epochs": self.num_epochs,
+            "agents_evaluated": self.agents_evaluated,
+            "agents_per_epoch": self.agents_per_epoch,
+            "games": self.games,
+            "pieces": self.pieces,
+            "games_per_second": self.games / elapsed,
+            "pieces_per_second": self.pieces / elapsed,
+            "best_fitness": self.best_fitness,
+            "eta_seconds": self.eta(elapsed),
+        }
+
+    def maybe_publish(self):
+        if time.time() - self.last_publish >= self.interval:
+            self.publish()
+
+    def publish(self):
+        self.latest = self.snapshot()
+        self.last_publish = self.latest["time"]
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self.rotate()
+        with open(self.path, "a") as f:
+            f.write(json.dumps(self.latest) + "\n")
+
+    def rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def close(self):
+        self.publish()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def latest_snapshots(directory=TELEMETRY_DIR):
+    """Last snapshot of every run under `directory`."""
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(directory, "**", "*.jsonl"), recursive=True)):
+        with open(path, "rb") as f:
+            f.seek(max(os.path.getsize(path) - 4096, 0))
+            lines = f.read().splitlines()
+        if lines:
+            snapshots.append(json.loads(lines[-1]))
+    return snapshots
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    directory = argv[0] if argv else TELEMETRY_DIR
+    now = time.time()
+    print(f"{'run':<32} {'epoch':>7} {'agents':>7} {'games/s':>8} {'pieces/s':>9} {'best':>9} {'ETA':>9} {'age':>6}")
+    for s in latest_snapshots(directory):
+        epoch = f"{s['epoch'] + 1}/{s['num_epochs']}" if s["num_epochs"] else str(s["epoch"])
+        best = "-" if s["best_fitness"] is None else f"{s['best_fitness']:.1f}"
+        print(
+            f"{s['run']:<32} {epoch:>7} {s['agents_evaluated']:>7} {s['games_per_second']:>8.2f} "
+            f"{s['pieces_per_second']:>9.0f} {best:>9} {format_eta(s['eta_seconds']):>9} {now - s['time']:>5.0f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Paired-seed tournament: every entrant plays the same seeded piece sequences,
+so agents are compared on paired per-seed differences instead of independent
+samples, which separates them with far fewer games.
+
+    python src/main.py tournament --entrants greedy greedy_unit genetic mcts_array \\
+        --workers 16 --round 20 --max-games 500
+
+Games are played in rounds of `--round` new seeds for every entrant. After each
+round entrants are ranked by their mean and, for each pair of neighbours in the
+ranking, a Student t confidence interval of the mean paired difference is
+computed. The tournament looks at the intervals after every round from
+`--min-games` seeds on, so `--alpha` is spent across the neighbouring pairs
+and every look it could stop at (Bonferroni over pairs x looks), which keeps
+the chance of any wrongly settled pair below alpha however early it stops. It
+stops once every interval excludes zero or the neighbours are tied (played
+exactly the same games).
+Results stream to data/tournament/<name>.csv, one line per game.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+HEADER = "game, seed, agent, dropped, rows, seconds\n"
+
+# Best genotype of data/genetic/old/data_15.csv
+GENOTYPE = (-0.22968359, 0.75336347, 0.0718565, -0.46594466, -0.09289146, -0.34609956, -0.29737703, -0.38998696, -0.12171042)
+
+# name -> (mode, weights): greedy weights are (height, holes, bumpiness, cleared),
+# genetic weights are a genotype
+PRESETS = {
+    "greedy": ("greedy", (0.5, 0.35, 0.18, -0.76)),
+    "greedy_unit": ("greedy", (1, 1, 1, -1)),
+    "genetic": ("genetic", GENOTYPE),
+    "genetic_pruned": ("genetic_pruned", GENOTYPE),
+    "mcts": ("mcts", None),
+    "mcts_array": ("mcts_array", None),
+    "table": ("table", None),
+}
+
+
+def parse_entrant(text):
+    """'preset' or 'name=mode:w1,w2,...' -> (name, mode, weights)."""
+    if "=" not in text:
+        if text not in PRESETS:
+            raise ValueError(f"unknown preset {text!r}, choose from {', '.join(PRESETS)} or use name=mode:weights")
+        return (text,) + PRESETS[text]
+    name, spec = text.split("=", 1)
+    mode, _, weights = spec.partition(":")
+    return name, mode, tuple(float(w) for w in weights.split(",")) if weights else None
+
+
+def make_agent(mode, weights):
+    from genetic import Genetic_AI
+    from genetic_pruned import Pruned_Genetic_AI
+    from greedy import Greedy_AI
+
+    if weights is None:
+        return None
+    if mode == "greedy":
+        return Greedy_AI(weights=weights)
+    if mode == "genetic":
+        return Genetic_AI(genotype=np.array(weights))
+    if mode == "genetic_pruned":
+        return Pruned_Genetic_AI(genotype=np.array(weights))
+    raise ValueError(f"mode {mode!r} takes no weights")
+
+
+def play_match(job):
+    """Play one entrant on one seed; runs inside a worker process."""
+    from game import Game
+
+    game_index, seed, entrant, mode, weights, width, height = job
+    # Agents draw from the global generators (MCTS rollouts): seed them too,
+    # so a match is reproducible
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    start = time.perf_counter()
+    game = Game(mode, agent=make_agent(mode, weights), seed=seed, width=width, height=height)
+    dropped, rows = game.run_no_visual(verbose=False)
+    return game_index, seed, entrant, dropped, rows, time.perf_counter() - start
+
+
+def metric_values(dropped, rows, metric):
+    if metric == "rows":
+        return rows
+    if metric == "log_dropped":
+        return np.log(dropped)
+    return dropped
+
+
+def betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b), from its continued fraction."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        # The fraction converges fast on this side only
+        return 1 - betainc(b, a, 1 - x)
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)) / a
+    tiny = 1e-300
+    # Lentz's method
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    f = d
+    for m in range(1, 500):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            f *= c * d
+        if abs(c * d - 1) < 1e-15:
+            break
+    return front * f
+
+
+def t_quantile(p, df):
+    """Quantile of Student's t distribution with `df` degrees of freedom, for p >= 0.5."""
+    def upper_tail(t):
+        return 0.5 * betainc(df / 2, 0.5, df / (df + t * t))
+
+    low, high = 0.0, 1.0
+    while upper_tail(high) > 1 - p:
+        low, high = high, 2 * high
+    for _ in range(100):
+        mid = (low + high) / 2
+        if upper_tail(mid) > 1 - p:
+            low = mid
+        else:
+            high = mid
+    return high
+
+
+def paired_interval(a, b, tail):
+    """Mean of a - b over the shared seeds and the half width of its t interval leaving `tail` on each side."""
+    d = a - b
+    n = len(d)
+    if n < 2:
+        return d.mean(), math.inf
+    return d.mean(), t_quantile(1 - tail, n - 1) * d.std(ddof=1) / math.sqrt(n)
+
+
+def rank(scores, names, alpha=0.05, looks=1):
+    """
+    Entrants sorted by mean score, and for each neighbouring pair in that order
+    (name, next_name, mean_diff, half_width, status), where status is 'tied'
+    for identical scores, 'settled' once the interval excludes zero and 'open'
+    otherwise. `alpha` is split over the pairs and the `looks` at the data
+    that could stop the tournament.
+    """
+    order = sorted(range(len(names)), key=lambda i: -scores[i].mean())
+    pairs = max(len(names) - 1, 1)
+    tail = alpha / (2 * pairs * looks)
+    neighbours = []
+    for i, j in zip(order, order[1:]):
+        mean, half = paired_interval(scores[i], scores[j], tail)
+        if np.array_equal(scores[i], scores[j]):
+            status = "tied"
+        else:
+            status = "settled" if abs(mean) > half else "open"
+        neighbours.append((names[i], names[j], mean, half, status))
+    return [names[i] for i in order], neighbours
+
+
+def decided(neighbours):
+    """Whether every neighbouring pair is settled or tied."""
+    return all(status != "open" for *_, status in neighbours)
+
+
+def format_ranking(ranking, neighbours):
+    """'a > b = c': ties joined with '=', everything else in ranking order."""
+    text = ranking[0]
+    for (_, _, _, _, status), name in zip(neighbours, ranking[1:]):
+        text += f" {'=' if status == 'tied' else '>'} {name}"
+    return text
+
+
+def format_standings(names, scores, neighbours, metric):
+    lines = [f"{'rank':<5} {'entrant':<16} {'mean ' + metric:>18}"]
+    means = {name: s.mean() for name, s in zip(names, scores)}
+    for r, name in enumerate(sorted(names, key=lambda n: -means[n]), 1):
+        lines.append(f"{r:<5} {name:<16} {means[name]:>18.2f}")
+    for a, b, mean, half, status in neighbours:
+        lines.append(f"  {a} - {b}: {mean:+.2f} +/- {half:.2f} ({status})")
+    return "\n".join(lines)
+
+
+def run_tournament(
+    entrants,
+    workers=None,
+    seed=0,
+    round_games=20,
+    min_games=20,
+    max_games=1000,
+    metric="dropped",
+    alpha=0.05,
+    width=10,
+    height=20,
+    output=None,
+):
+    """
+    Play `entrants` ((name, mode, weights) tuples) on shared seeds `seed`,
+    `seed + 1`, ... until the ranking is settled or `max_games` seeds were
+    played. Returns (ranking, neighbours, games_per_entrant).
+    """
+    names = [e[0] for e in entrants]
+    if len(set(names)) != len(names):
+        raise ValueError("entrant names must be unique")
+    dropped = {name: [] for name in names}
+    rows = {name: [] for name in names}
+
+    out = None
+    if output is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        out = open(output, "w")
+        out.write(HEADER)
+
+    # Looks that may stop the tournament: one per round from min_games seeds on
+    rounds = math.ceil(max_games / round_games)
+    looks = rounds - min(math.ceil(min_games / round_games), rounds) + 1
+
+    games = 0
+    start = time.perf_counter()
+    try:
+        with Pool(workers) as pool:
+            while games < max_games:
+                batch = min(round_games, max_games - games)
+                jobs = [
+                    (g, seed + g, name, mode, weights, width, height)
+                    for g in range(games, games + batch)
+                    for name, mode, weights in entrants
+                ]
+                results = {}
+                for n, (g, game_seed, name, d, r, seconds) in enumerate(pool.imap_unordered(play_match, jobs), 1):
+                    results[g, name] = (d, r)
+                    if out is not None:
+                        out.write(f"{g}, {game_seed}, {name}, {d}, {r}, {seconds:.3f}\n")
+                        out.flush()
+                    sys.stderr.write(f"\rround {games // round_games + 1}: {n}/{len(jobs)} games")
+                # Keep every entrant's columns aligned on the seed
+                for g in range(games, games + batch):
+                    for name in names:
+                        dropped[name].append(results[g, name][0])
+                        rows[name].append(results[g, name][1])
+                games += batch
+
+                scores = [metric_values(np.array(dropped[n]), np.array(rows[n]), metric) for n in names]
+                ranking, neighbours = rank(scores, names, alpha, looks)
+                elapsed = time.perf_counter() - start
+                sys.stderr.write(f"\r{games} seeds x {len(names)} entrants in {elapsed:.0f}s\n")
+                print(format_standings(names, scores, neighbours, metric), file=sys.stderr)
+                if games >= min_games and decided(neighbours):
+                    break
+    finally:
+        if out is not None:
+            out.close()
+    return ranking, neighbours, games
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py tournament", description=__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--entrants",
+        nargs="+",
+        default=["greedy", "greedy_unit", "genetic"],
+        help=f"presets ({', '.join(PRESETS)}) or name=mode:w1,w2,... for custom weights",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--round", type=int, default=20, help="seeds played by every entrant between checks")
+    parser.add_argument("--min-games", type=int, default=20)
+    parser.add_argument("--max-games", type=int, default=1000)
+    parser.add_argument("--metric", choices=["dropped", "rows", "log_dropped"], default="dropped")
+    parser.add_argument("--alpha", type=float, default=0.05, help="family-wise error rate of the ranking, over all rounds")
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=20)
+    parser.add_argument("--name", default="tournament", help="results go to data/tournament/<name>.csv")
+    args = parser.parse_args(argv)
+
+    entrants = [parse_entrant(e) for e in args.entrants]
+    output = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tournament", f"{args.name}.csv")
+    ranking, neighbours, games = run_tournament(
+        entrants,
+        workers=args.workers,
+        seed=args.seed,
+        round_games=args.round,
+        min_games=args.min_games,
+        max_games=args.max_games,
+        metric=args.metric,
+        alpha=args.alpha,
+        width=args.width,
+        height=args.height,
+        output=output,
+    )
+    print(f"{'settled' if decided(neighbours) else 'not settled'} after {games} seeds: {format_ranking(ranking, neighbours)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Per-move trajectory recording for offline learning.
+
+TrajectoryWriter appends fixed-size records (packed board before the move,
+piece, chosen rotation/x/y, rows cleared, features of the resulting board) to
+raw shard files that can be memory-mapped. TrajectoryDataset memory-maps the
+shards and streams shuffled mini-batches without reading the whole dataset.
+
+    game = Game("greedy", recorder=TrajectoryWriter("data/trajectories/greedy"))
+    game.run_no_visual()
+    game.recorder.close()
+
+    dataset = TrajectoryDataset("data/trajectories/greedy")
+    for batch in dataset.batches(256):
+        boards = unpack_boards(batch, dataset.width, dataset.height)
+"""
+
+import glob
+import json
+import os
+import uuid
+
+import numpy as np
+
+from genetic_helpers import get_features_batch
+from piece import PIECE_IDS, PIECE_ROTATIONS
+
+NUM_FEATURES = 9
+
+
+def record_dtype(width, height):
+    cells = width * (height + 4)
+    return np.dtype(
+        [
+            ("board", np.uint8, ((cells + 7) // 8,)),  # np.packbits of the board before the move
+            ("piece", np.uint8),  # index in BODIES2
+            ("rotation", np.uint8),  # index in PIECE_ROTATIONS[piece]
+            ("x", np.int8),
+            ("y", np.int8),
+            ("reward", np.int8),  # rows cleared by the move
+            ("features", np.float32, (NUM_FEATURES,)),  # Genetic_AI ratings of the board after the move
+        ]
+    )
+
+
+def unpack_boards(records, width, height):
+    """(n, height + 4, width) bool boards from a batch of records."""
+    cells = width * (height + 4)
+    bits = np.unpackbits(records["board"], axis=1, count=cells)
+    return bits.reshape(len(records), height + 4, width).astype(bool)
+
+
+class TrajectoryWriter:
+    def __init__(self, directory, width=10, height=20, shard_records=1 << 16, buffer_records=4096):
+        self.directory = directory
+        self.width = width
+        self.height = height
+        self.dtype = record_dtype(width, height)
+        self.shard_records = shard_records
+        self.buffer = np.zeros(buffer_records, dtype=self.dtype)
+        self.buffered = 0
+        # Several writers (e.g. bench workers) can share a directory
+        self.prefix = uuid.uuid4().hex[:8]
+        self.shard = 0
+        self.shard_written = 0
+        os.makedirs(directory, exist_ok=True)
+        meta = {"width": width, "height": height, "record_bytes": self.dtype.itemsize}
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def record(self, board, piece, x, y, chosen, reward=0):
+        """
+        Store one move: `board` is the Board before the move, `piece` the piece
+        dealt, `chosen` the rotated piece placed at (x, y).
+        """
+        if self.buffered == len(self.buffer):
+            self.flush()
+        piece_id = PIECE_IDS[tuple(piece.body)]
+        cells = sorted(chosen.body)
+        rotation = next(r for r, p in enumerate(PIECE_ROTATIONS[piece_id]) if sorted(p.body) == cells)
+        rec = self.buffer[self.buffered]
+        rec["board"] = np.packbits(np.asarray(board.board, dtype=bool))
+        rec["piece"] = piece_id
+        rec["rotation"] = rotation
+        rec["x"] = x
+        rec["y"] = y
+        rec["reward"] = reward
+        self.buffered += 1
+
+    def set_last_reward(self, reward):
+        """Set the reward of the last recorded move, once the move has been played."""
+        self.buffer[self.buffered - 1]["reward"] = reward
+
+    def flush(self):
+        if not self.buffered:
+            return
+        records = self.buffer[: self.buffered]
+        # Features of every buffered after-state in one batch
+        boards = unpack_boards(records, self.width, self.height).astype(int)
+        for i, rec in enumerate(records):
+            piece = PIECE_ROTATIONS[rec["piece"]][rec["rotation"]]
+            for pos in piece.body:
+                boards[i, rec["y"] + pos[1], rec["x"] + pos[0]] = 1
+        records["features"] = get_features_batch(boards)
+
+        start = 0
+        while start < len(records):
+            n = min(len(records) - start, self.shard_records - self.shard_written)
+            path = os.path.join(self.directory, f"shard_{self.prefix}_{self.shard:05d}.bin")
+            with open(path, "ab") as f:
+                f.write(records[start : start + n].tobytes())
+            start += n
+            self.shard_written += n
+            if self.shard_written == self.shard_records:
+                self.shard += 1
+                self.shard_written = 0
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+
+
+class TrajectoryDataset:
+    def __init__(self, directory):
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.dtype = record_dtype(self.width, self.height)
+        if self.dtype.itemsize != meta["record_bytes"]:
+            raise ValueError(f"{directory} was written with a different record layout")
+        self.shards = []
+        for path in sorted(glob.glob(os.path.join(directory, "shard_*.bin"))):
+            count = os.path.getsize(path) // self.dtype.itemsize
+            if count:
+                self.shards.append(np.memmap(path, dtype=self.dtype, mode="r", shape=(count,)))
+
+    def __len__(self):
+        return sum(len(s) for s in self.shards)
+
+    def batches(self, batch_size, shuffle=True, seed=None, window=4):
+        """
+        Yield record arrays of batch_size. With shuffle, shards are visited in
+        random order, `window` at a time, and records are drawn at random from
+        the shards in the window, so only those shards' pages are touched.
+        """
+        rng = np.random.default_rng(seed)
+        order = rng.permutation(len(self.shards)) if shuffle else np.arange(len(self.shards))
+        for start in range(0, len(order), window):
+            shards = [self.shards[i] for i in order[start : start + window]]
+            index = np.concatenate([np.stack([np.full(len(s), k), np.arange(len(s))], axis=1) for k, s in enumerate(shards)])
+            if shuffle:
+                rng.shuffle(index)
+            for b in range(0, len(index), batch_size):
+                chunk = index[b : b + batch_size]
+                batch = np.empty(len(chunk), dtype=self.dtype)
+                for k, shard in enumerate(shards):
+                    mask = chunk[:, 0] == k
+                    batch[mask] = shard[chunk[mask, 1]]
+                yield batch
+